@@ -0,0 +1,235 @@
+#
+# Copyright (C) 2008 - Mark Dillavou
+# Copyright (C) 2008 - UAB Game Developers Club (www.uab.edu/gamedev/)
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2, or (at your option)
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301  USA.
+
+import os
+import time
+import threading
+
+import pygame
+from pygame.locals import *
+
+from .Singleton import Singleton
+from .bundle import open_bundle
+
+class Assets(Singleton):
+    '''Every image the game uses, loaded from disk once per process.
+
+    image() caches both the decoded file and each variant asked for
+    (converted, colorkeyed, flipped, scaled), so asking again is a
+    dictionary lookup.  preload() does the loading in a background thread,
+    which the menu uses so that starting a game does no disk i/o.  Files
+    come out of the image bundle of their directory when there is one
+    (see bundle.py), and are only decoded from disk when it doesn't have
+    them, or have an older copy than the file.
+
+    Every image is kept in the display's pixel format, so blitting never
+    has to convert pixels: convert() for opaque and colorkeyed images,
+    convert_alpha() for the rest, which keep their per pixel alpha, and RLE
+    encoded whenever they have see through parts.  Images asked for before
+    there is a display keep their file format until normalize() is
+    called.'''
+
+    def __init__(self):
+        if not self._isFirstInit():
+            return
+
+        self.files = {}
+        self.variants = {}
+        self.masks = {}
+        # the bundle of every directory looked in, None where there is none
+        self.bundles = {}
+        self.use_bundles = True
+        self.hits = 0
+        self.misses = 0
+        self.bundled = 0
+        self.lock = threading.RLock()
+        self.preload_thread = None
+
+    def _load_file(self, filename):
+        image = self.files.get(filename)
+        if image is None:
+            bundle = self._bundle(os.path.dirname(filename))
+            name = os.path.basename(filename)
+            if bundle is not None and bundle.fresh(name, filename):
+                image = bundle.surface(name)
+                self.bundled += 1
+            else:
+                try:
+                    image = pygame.image.load(filename)
+                except pygame.error as message:
+                    print('Cannot load image:', filename)
+                    raise SystemExit(message)
+            self.files[filename] = image
+        return image
+
+    def _bundle(self, directory):
+        if not self.use_bundles:
+            return None
+        if directory not in self.bundles:
+            self.bundles[directory] = open_bundle(directory)
+        return self.bundles[directory]
+
+    def image(self, filename, colorkey=None, convert=True, flipped=False, scale=None):
+        key = (filename, colorkey, convert, flipped, scale)
+        with self.lock:
+            image = self.variants.get(key)
+            if image is not None:
+                self.hits += 1
+                return image
+            self.misses += 1
+
+            if flipped or scale is not None:
+                # derive from the plain variant
+                image = self.image(filename, colorkey, convert)
+                if flipped:
+                    image = pygame.transform.flip(image, 1, 0)
+                if scale is not None:
+                    image = pygame.transform.scale(image, scale)
+                accelerate(image)
+            else:
+                image = self._load_file(filename)
+                if pygame.display.get_surface() is None:
+                    # don't set a colorkey on the shared decoded file
+                    image = image.copy()
+                elif convert:
+                    image = image.convert()
+                else:
+                    image = image.convert_alpha()
+                # per pixel alpha already says what is see through
+                if colorkey is not None and not image.get_flags() & SRCALPHA:
+                    if colorkey == -1:
+                        colorkey = image.get_at((0,0))
+                    image.set_colorkey(colorkey)
+                if pygame.display.get_surface() is not None:
+                    accelerate(image)
+
+            self.variants[key] = image
+            return image
+
+    def mask(self, image):
+        '''The collision mask of image, made the first time it is asked
+        for.  Every variant (each flipped shrimp too) gets its own.'''
+        mask = self.masks.get(image)
+        if mask is None:
+            mask = pygame.mask.from_surface(image)
+            self.masks[image] = mask
+        return mask
+
+    def normalize(self):
+        '''Bring every image loaded so far into the display's pixel format.
+        Call once the display exists.  Returns how many were redone.'''
+        display = pygame.display.get_surface()
+        with self.lock:
+            stale = [key for key, image in self.variants.items() if not display_format(image, display)]
+            for key in stale:
+                del self.variants[key]
+            for key in stale:
+                self.image(*key)
+            return len(stale)
+
+    def audit(self, repeat=200):
+        '''The pixel format and the time of one blit to the display format,
+        in microseconds, of every file as decoded and every image as the
+        game uses it.'''
+        display = pygame.display.get_surface()
+        target = pygame.Surface(display.get_size()).convert()
+        rows = []
+        with self.lock:
+            for filename, image in sorted(self.files.items()):
+                rows.append(audit_row(os.path.basename(filename), 'file', image, display, target, repeat))
+            for key, image in sorted(self.variants.items(), key=str):
+                filename, colorkey, convert, flipped, scale = key
+                variant = []
+                if convert:
+                    variant.append('convert')
+                if colorkey is not None:
+                    variant.append('colorkey')
+                if flipped:
+                    variant.append('flipped')
+                if scale is not None:
+                    variant.append('%dx%d' % scale)
+                rows.append(audit_row(os.path.basename(filename), ','.join(variant) or '-', image, display, target, repeat))
+        return rows
+
+    def preload(self, manifest, wait=False, done=None):
+        '''Load every (filename, colorkey, convert, flipped) in manifest.
+        Unless wait is set this happens in a background thread and returns
+        straight away.  done() is called once everything is loaded.'''
+        if self.preload_thread is not None and self.preload_thread.is_alive():
+            if wait:
+                self.preload_thread.join()
+            return
+
+        def run():
+            for filename, colorkey, convert, flipped in manifest:
+                self.image(filename, colorkey, convert, flipped)
+            if done is not None:
+                done()
+
+        if wait:
+            run()
+        else:
+            self.preload_thread = threading.Thread(target=run, name='floatipop-preload')
+            self.preload_thread.daemon = True
+            self.preload_thread.start()
+
+    def stats(self):
+        with self.lock:
+            return {'hits': self.hits,
+                    'misses': self.misses,
+                    'files': len(self.files),
+                    'bundled': self.bundled,
+                    'variants': len(self.variants),}
+
+def accelerate(image):
+    '''RLE encode image if it has see through parts, which makes blitting
+    it a lot cheaper.'''
+    if image.get_flags() & SRCALPHA:
+        image.set_alpha(255, RLEACCEL)
+    elif image.get_colorkey() is not None:
+        image.set_colorkey(image.get_colorkey(), RLEACCEL)
+
+def display_format(image, display):
+    '''Whether image can be blitted to display without converting.'''
+    return image.get_bitsize() == display.get_bitsize() and image.get_masks()[:3] == display.get_masks()[:3]
+
+def describe(image):
+    flags = image.get_flags()
+    parts = ['%d bit' % image.get_bitsize(), 'masks %s' % ('/'.join(['%x' % m for m in image.get_masks()]))]
+    if flags & SRCALPHA:
+        parts.append('alpha')
+    if image.get_colorkey() is not None:
+        parts.append('colorkey')
+    if flags & (RLEACCEL | RLEACCELOK):
+        parts.append('rle')
+    return ' '.join(parts)
+
+def blit_cost(image, target, repeat):
+    blit = target.blit
+    start = time.perf_counter()
+    for i in range(repeat):
+        blit(image, (0, 0))
+    return (time.perf_counter() - start) * 1e6 / repeat
+
+def audit_row(name, variant, image, display, target, repeat):
+    return {'file': name,
+            'variant': variant,
+            'size': image.get_size(),
+            'format': describe(image),
+            'display_format': display_format(image, display),
+            'blit_us': blit_cost(image, target, repeat),}
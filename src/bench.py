@@ -0,0 +1,206 @@
+#
+# Copyright (C) 2008 - Mark Dillavou
+# Copyright (C) 2008 - UAB Game Developers Club (www.uab.edu/gamedev/)
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2, or (at your option)
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301  USA.
+
+'''Headless benchmarks of a game frame, phase by phase.
+
+    python -m floatipop.bench [options]
+
+Every run plays seeded games with scripted input at several fixed object
+counts, one simulation tick and one render per frame, and reports the
+average milliseconds per frame spent in each phase.  --save writes the
+results as a baseline, --compare fails (exit status 1) if any phase got
+slower than a saved baseline by more than the tolerance.  --audit instead
+lists the pixel format of every image and what one blit of it costs.'''
+
+import os
+import sys
+import json
+import argparse
+
+import pygame
+
+from . import floatipop as game
+from .floatipop import WIDTH, HEIGHT, load_image, render_hud
+from .simulation import Simulation, KeyState, TICK
+from .render import Renderer, DirtyRenderer
+from .text import NumberText
+from .assets import Assets, describe
+
+PHASES = ('input', 'spawn', 'update', 'collision', 'cleanup', 'draw', 'flip')
+
+DEFAULT_COUNTS = (10, 50, 200, 800)
+
+# phases faster than this (ms per frame) are too noisy to fail a run on
+NOISE_FLOOR = .02
+
+class PhaseTimer(object):
+    '''Adds up the time spent in each phase.'''
+    def __init__(self):
+        self.totals = dict([(p, 0.0) for p in PHASES])
+
+    def add(self, phase, seconds):
+        self.totals[phase] = self.totals.get(phase, 0.0) + seconds
+
+def script(frame):
+    '''The input for a frame: flap in short bursts and sweep left and
+    right, which keeps the shrimp in the air most of the time.'''
+    flap = frame % 12 < 2
+    sweep = (frame // 90) % 4
+    return KeyState(left=sweep == 1, right=sweep == 3, flap=flap)
+
+def init_display():
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    pygame.display.init()
+    pygame.font.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    Assets().normalize()
+    return screen
+
+def run_case(screen, count, frames, warmup, seed, dirty=False, entities=False, sky_fps=None, precise=True,
+             tick=TICK):
+    '''Average ms per frame of each phase with count objects alive.'''
+    background, r = load_image('background.png')
+    hud = NumberText(pygame.font.Font(None, 36), "Score: ", (220, 220, 220))
+
+    sim = Simulation(seed=seed, tick=tick, scenery=True, entities=entities, objects=count, immortal=True)
+    sim.precise_collisions = precise
+    if dirty:
+        renderer = DirtyRenderer(screen, background, sky_fps)
+    else:
+        renderer = Renderer(screen, background, sky_fps)
+
+    # spread the objects across the screen before timing anything
+    for frame in range(warmup):
+        sim.step(script(frame))
+
+    timer = PhaseTimer()
+    sim.timer = timer
+    renderer.timer = timer
+    for frame in range(warmup, warmup + frames):
+        sim.step(script(frame))
+        renderer.draw(sim, render_hud(hud, sim.player))
+
+    result = {}
+    for phase, total in timer.totals.items():
+        result[phase] = total * 1000.0 / frames
+    result['total'] = sum([result[p] for p in PHASES])
+    result['sky_hits'] = renderer.sky.stats()['hits_per_second']
+    # what drawing costs per object, in microseconds
+    result['draw_per_object'] = result['draw'] * 1000.0 / max(count, 1)
+    return result
+
+def run(counts=DEFAULT_COUNTS, frames=300, warmup=600, seed=1, dirty=False, entities=False, sky_fps=None, precise=True,
+        tick=TICK):
+    screen = init_display()
+    results = {}
+    for count in counts:
+        results[str(count)] = run_case(screen, count, frames, warmup, seed, dirty, entities, sky_fps, precise, tick)
+    return results
+
+def report(results, out=sys.stdout):
+    columns = PHASES + ('total',)
+    out.write('%8s' % 'objects' + ''.join(['%10s' % c for c in columns]) + '%10s%10s' % ('draw/obj', 'sky hit/s') + '\n')
+    for count in sorted(results, key=int):
+        row = results[count]
+        out.write('%8s' % count + ''.join(['%10.3f' % row.get(c, 0.0) for c in columns]) +
+                  '%10.2f%10.1f' % (row.get('draw_per_object', 0.0), row.get('sky_hits', 0.0)) + '\n')
+    out.write('(ms per frame, draw/obj in us, sky composites reused per simulated second)\n')
+
+def audit(repeat=200, out=sys.stdout):
+    '''Load every image and list its format and blit cost, the files as
+    decoded next to the images the game blits.'''
+    screen = init_display()
+    game.preload_images(game.MENU_IMAGES + game.GAME_IMAGES, True)
+    out.write('display: %s\n' % describe(screen))
+    out.write('%-18s %-22s %-8s %-6s %8s  %s\n' % ('file', 'variant', 'size', 'match', 'blit us', 'format'))
+    for row in Assets().audit(repeat):
+        out.write('%-18s %-22s %-8s %-6s %8.2f  %s\n' % (row['file'], row['variant'], '%dx%d' % row['size'],
+                                                       row['display_format'] and 'yes' or 'NO', row['blit_us'], row['format']))
+
+def compare(results, baseline, tolerance):
+    '''Every (count, phase, baseline ms, current ms) that got slower by
+    more than tolerance.'''
+    regressions = []
+    for count, row in sorted(results.items(), key=lambda i: int(i[0])):
+        base = baseline.get(count)
+        if base is None:
+            continue
+        for phase in PHASES:
+            old = base.get(phase)
+            new = row.get(phase)
+            if old is None or new is None:
+                continue
+            if new > old * (1.0 + tolerance) and new - old > NOISE_FLOOR:
+                regressions.append((count, phase, old, new))
+    return regressions
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog='floatipop.bench', description=__doc__.split('\n')[0])
+    parser.add_argument('--counts', default=','.join([str(c) for c in DEFAULT_COUNTS]),
+                        help='comma separated object counts to sweep')
+    parser.add_argument('--frames', type=int, default=300, help='timed frames per count')
+    parser.add_argument('--warmup', type=int, default=600, help='untimed frames before timing')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--dirty-rects', action='store_true', help='time the dirty rect renderer')
+    parser.add_argument('--entities', action='store_true', help='use the numpy entity store')
+    parser.add_argument('--sky-fps', type=int, default=game.SKY_FPS,
+                        help='how often the clouds are composited, 0 for whenever they move')
+    parser.add_argument('--rect-collisions', action='store_true',
+                        help='collide by rects only instead of rects and then masks')
+    parser.add_argument('--tick', type=float, default=TICK,
+                        help='seconds per simulation tick, coarse ticks stress the swept collisions')
+    parser.add_argument('--data-dir', help='where the game images are')
+    parser.add_argument('--audit', action='store_true', help='list the format and blit cost of every image')
+    parser.add_argument('--save', metavar='FILE', help='write the results as a baseline')
+    parser.add_argument('--compare', metavar='FILE', help='fail on regressions against a baseline')
+    parser.add_argument('--tolerance', type=float, default=.25,
+                        help='allowed slow down before a phase counts as a regression')
+    options = parser.parse_args(args)
+
+    if options.data_dir:
+        game.DATA_DIR = options.data_dir
+
+    if options.audit:
+        audit()
+        return 0
+
+    counts = [int(c) for c in options.counts.split(',')]
+    results = run(counts, options.frames, options.warmup, options.seed,
+                  options.dirty_rects, options.entities, options.sky_fps,
+                  not options.rect_collisions, options.tick)
+    report(results)
+
+    if options.save:
+        f = open(options.save, 'w')
+        json.dump(results, f, indent=1, sort_keys=True)
+        f.close()
+
+    if options.compare:
+        f = open(options.compare, 'r')
+        baseline = json.load(f)
+        f.close()
+        regressions = compare(results, baseline, options.tolerance)
+        for count, phase, old, new in regressions:
+            print('REGRESSION %s objects, %s: %.3f ms -> %.3f ms' % (count, phase, old, new))
+        if regressions:
+            return 1
+        print('no regressions against', options.compare)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,147 @@
+#
+# Copyright (C) 2008 - Mark Dillavou
+# Copyright (C) 2008 - UAB Game Developers Club (www.uab.edu/gamedev/)
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2, or (at your option)
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301  USA.
+
+'''Every image of a data directory decoded ahead of time into one file.
+
+A bundle is a header, an index of every image and then the raw pixels of
+each, so loading an image is making a surface straight on top of the
+memory mapped file, with no PNG to decode.  The index keeps the time and
+size of every file packed, so an image edited since is loaded from its
+file instead.  pack.py builds one.'''
+
+import os
+import mmap
+import struct
+
+import pygame
+from pygame.locals import *
+
+BUNDLE = 'images.bundle'
+
+MAGIC = b'FPIB'
+VERSION = 2
+
+# magic, version, images
+HEADER = struct.Struct('<4sHI')
+# name, width, height, pixel format, has a colorkey, colorkey, offset,
+# length, modification time (ns) and size of the file packed
+ENTRY = struct.Struct('<64sHH4sB4sQIqQ')
+# pixels start on a boundary of this many bytes
+ALIGN = 64
+
+class Bundle(object):
+    '''An open bundle file.'''
+
+    def __init__(self, filename):
+        f = open(filename, 'rb')
+        try:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        finally:
+            f.close()
+        self.data = memoryview(self.map)
+
+        magic, version, count = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('%s is not an image bundle this version can read' % filename)
+
+        self.index = {}
+        offset = HEADER.size
+        for i in range(count):
+            (name, width, height, format, keyed, colorkey, start, length,
+             mtime, size) = ENTRY.unpack_from(self.map, offset)
+            offset += ENTRY.size
+            if start + length > len(self.map):
+                raise ValueError('%s is truncated' % filename)
+            if not keyed:
+                colorkey = None
+            self.index[name.rstrip(b'\0').decode('utf-8')] = ((width, height), format.rstrip(b'\0').decode('ascii'),
+                                                               colorkey, start, length, (mtime, size))
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def fresh(self, name, filename):
+        '''Whether the bundle has name as filename is now.  A bundle
+        shipped without the files is taken as it is.'''
+        if name not in self.index:
+            return False
+        try:
+            st = os.stat(filename)
+        except OSError:
+            return True
+        return self.index[name][5] == (st.st_mtime_ns, st.st_size)
+
+    def __len__(self):
+        return len(self.index)
+
+    def surface(self, name):
+        '''The image called name, sharing its pixels with the file.  Don't
+        draw on it, copy or convert it first.'''
+        size, format, colorkey, start, length, source = self.index[name]
+        image = pygame.image.frombuffer(self.data[start:start + length], size, format)
+        if colorkey is not None:
+            image.set_colorkey(tuple(bytearray(colorkey)))
+        return image
+
+    def close(self):
+        self.data.release()
+        self.map.close()
+
+def open_bundle(directory):
+    '''The bundle in directory, or None if there is no usable one.'''
+    filename = os.path.join(directory, BUNDLE)
+    try:
+        return Bundle(filename)
+    except (IOError, OSError):
+        return None
+    except (ValueError, struct.error) as message:
+        print('Ignoring image bundle:', message)
+        return None
+
+def write_bundle(filename, images):
+    '''Write the (name, surface, source file) of images out as a bundle.'''
+    entries = []
+    blobs = []
+    offset = HEADER.size + ENTRY.size * len(images)
+    for name, image, source in images:
+        st = os.stat(source)
+        if len(name.encode('utf-8')) > 64:
+            raise ValueError('image name too long for a bundle: %s' % name)
+        if image.get_flags() & SRCALPHA:
+            format = 'RGBA'
+        else:
+            format = 'RGB'
+        pixels = pygame.image.tobytes(image, format)
+        offset += -offset % ALIGN
+        colorkey = image.get_colorkey()
+        entries.append(ENTRY.pack(name.encode('utf-8'), image.get_width(), image.get_height(),
+                                  format.encode('ascii'), colorkey is not None,
+                                  bytes(bytearray(colorkey or (0, 0, 0, 0))), offset, len(pixels),
+                                  st.st_mtime_ns, st.st_size))
+        blobs.append((offset, pixels))
+        offset += len(pixels)
+
+    temp = filename + '.tmp'
+    f = open(temp, 'wb')
+    f.write(HEADER.pack(MAGIC, VERSION, len(images)))
+    f.write(b''.join(entries))
+    for offset, pixels in blobs:
+        f.write(b'\0' * (offset - f.tell()))
+        f.write(pixels)
+    f.close()
+    os.replace(temp, filename)
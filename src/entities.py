@@ -0,0 +1,253 @@
+#
+# Copyright (C) 2008 - Mark Dillavou
+# Copyright (C) 2008 - UAB Game Developers Club (www.uab.edu/gamedev/)
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2, or (at your option)
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301  USA.
+
+import random
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+import pygame
+
+from .floatipop import WIDTH, HEIGHT, Star, Whale, Balloon, load_image
+
+# entity kinds
+STAR = 0
+WHALE = 1
+BALLOON = 2
+
+# per kind movement constants, indexed by kind
+SWIM_SPEED = (1.0, 1.2, 1.0)
+WOBBLE_X = (0.0, 0.0, 10.0)
+
+def entity_images():
+    '''The images for each kind, shared with the Star, Whale and Balloon
+    sprites.'''
+    if Star.image is None:
+        Star.image, r = load_image('star.png', -1, False)
+    if Whale.image is None:
+        Whale.image, r = load_image('whale.png', -1, False)
+    if Balloon.image is None:
+        Balloon.image, r = load_image('balloon1.png', -1)
+    return {STAR: Star.image, WHALE: Whale.image, BALLOON: Balloon.image}
+
+class EntityView(object):
+    '''What the player gets to see of an entity it collided with.'''
+    def __init__(self, kind, rect):
+        self.kind = kind
+        self.rect = rect
+
+class EntityStore(object):
+    '''Stars, whales and balloons kept as parallel numpy arrays.
+
+    Every entity is one index into the arrays below, positions are the
+    centre of the entity.  update() moves all of them with a handful of
+    array operations instead of one python update() per sprite, and draw()
+    is the only place that deals with images.'''
+
+    FIELDS = (('kind', 'int8'),
+              ('x', 'float64'),
+              ('y', 'float64'),
+              # where it was at the start of the tick
+              ('previous_x', 'float64'),
+              ('previous_y', 'float64'),
+              ('start_x', 'float64'),
+              ('start_y', 'float64'),
+              ('offset_x', 'float64'),
+              ('speed', 'float64'),
+              ('displacement', 'float64'),
+              ('direction', 'float64'),
+              ('start_time', 'float64'),
+              ('swim', 'float64'),
+              ('wobble', 'float64'),
+              ('w', 'float64'),
+              ('h', 'float64'),
+              )
+
+    def __init__(self, images, capacity=64):
+        if numpy is None:
+            raise RuntimeError('numpy is required for the entity store')
+
+        self.images = images
+        self.sizes = {}
+        for kind, image in images.items():
+            self.sizes[kind] = image.get_size()
+        self.sizes[STAR] = (32, 32)
+
+        self.count = 0
+        self.capacity = 0
+        for name, dtype in EntityStore.FIELDS:
+            setattr(self, name, numpy.zeros(0, dtype))
+        self._grow(capacity)
+
+    def __len__(self):
+        return self.count
+
+    def _grow(self, capacity):
+        for name, dtype in EntityStore.FIELDS:
+            a = numpy.zeros(capacity, dtype)
+            a[:self.count] = getattr(self, name)[:self.count]
+            setattr(self, name, a)
+        self.capacity = capacity
+
+    def spawn(self, kind, x, y, now, speed=0.0, displacement=0.0, direction=1.0):
+        if self.count == self.capacity:
+            self._grow(self.capacity * 2)
+
+        i = self.count
+        w, h = self.sizes[kind]
+        self.kind[i] = kind
+        self.x[i] = self.start_x[i] = self.previous_x[i] = x
+        self.y[i] = self.start_y[i] = self.previous_y[i] = y
+        self.offset_x[i] = 0.0
+        self.speed[i] = speed
+        self.displacement[i] = displacement
+        self.direction[i] = direction
+        self.start_time[i] = now
+        self.swim[i] = SWIM_SPEED[kind]
+        self.wobble[i] = WOBBLE_X[kind]
+        self.w[i] = w
+        self.h[i] = h
+        self.count += 1
+        return i
+
+    def update(self, dt, now, scroll_speed):
+        n = self.count
+        if n == 0:
+            return
+
+        kind = self.kind[:n]
+        y = self.y[:n]
+        start_y = self.start_y[:n]
+        direction = self.direction[:n]
+        self.previous_x[:n] = self.x[:n]
+        self.previous_y[:n] = y
+
+        # everyone drifts with the scrolling, balloons wobble as they go
+        self.offset_x[:n] += (WIDTH / float(scroll_speed) * dt) * self.swim[:n]
+        self.x[:n] = self.start_x[:n] + self.offset_x[:n] + self.wobble[:n] * numpy.sin(now * 7.0)
+
+        # stars bounce between their start and start + displacement
+        stars = kind == STAR
+        y += numpy.where(stars, self.speed[:n] * dt * direction, 0.0)
+        rel = y - start_y
+        flip = stars & (((direction == 1) & (rel > self.displacement[:n])) |
+                        ((direction == -1) & (rel <= 0)))
+        direction[flip] = -direction[flip]
+
+        # swim, i mean fly whale, fly!!  The same sums as Whale.update,
+        # which stays where it was spawned for its first tick
+        whales = kind == WHALE
+        t = now - self.start_time[:n][whales]
+        x = self.x[:n]
+        x[whales] = numpy.where(t > 0, WIDTH / float(scroll_speed) * self.swim[:n][whales] * t,
+                                self.start_x[:n][whales])
+        y[whales] = start_y[whales] + numpy.sin(t * 4.0) * 25.0
+
+        # balloons float away
+        balloons = kind == BALLOON
+        y[balloons] -= self.speed[:n][balloons] * dt
+
+    def overlapping(self, rect):
+        '''Indices of the entities whose box overlaps rect.'''
+        n = self.count
+        x = self.x[:n]
+        y = self.y[:n]
+        hw = self.w[:n] * .5
+        hh = self.h[:n] * .5
+        hits = ((x - hw < rect.right) & (x + hw > rect.left) &
+                (y - hh < rect.bottom) & (y + hh > rect.top))
+        return numpy.flatnonzero(hits)
+
+    def rect(self, i):
+        r = pygame.Rect(0, 0, int(self.w[i]), int(self.h[i]))
+        r.center = (int(self.x[i]), int(self.y[i]))
+        return r
+
+    def previous_rect(self, i):
+        '''rect(i) at the start of the tick.'''
+        r = pygame.Rect(0, 0, int(self.w[i]), int(self.h[i]))
+        r.center = (int(self.previous_x[i]), int(self.previous_y[i]))
+        return r
+
+    def view(self, i):
+        return EntityView(int(self.kind[i]), self.rect(i))
+
+    def _compact(self, keep):
+        n = self.count
+        m = int(keep.sum())
+        if m == n:
+            return
+        for name, dtype in EntityStore.FIELDS:
+            a = getattr(self, name)
+            a[:m] = a[:n][keep]
+        self.count = m
+
+    def remove(self, indices):
+        keep = numpy.ones(self.count, bool)
+        keep[indices] = False
+        self._compact(keep)
+
+    def remove_beyond(self, x):
+        '''Drop every entity that has scrolled completely past x.'''
+        n = self.count
+        self._compact(self.x[:n] - self.w[:n] * .5 < x)
+
+    def nearest(self, px, py, count):
+        '''(dx, dy, kind) of the count entities closest to (px, py).'''
+        n = self.count
+        dx = self.x[:n] - px
+        dy = self.y[:n] - py
+        order = numpy.argsort(dx * dx + dy * dy)[:count]
+        return list(zip(dx[order].tolist(), dy[order].tolist(), self.kind[order].tolist()))
+
+    def blit_list(self, bounds):
+        '''(image, position) of every entity overlapping bounds.'''
+        images = self.images
+        visible = self.overlapping(bounds)
+        kinds = self.kind[visible].tolist()
+        lefts = (self.x[visible] - self.w[visible] * .5).tolist()
+        tops = (self.y[visible] - self.h[visible] * .5).tolist()
+        return [(images[kind], (left, top)) for kind, left, top in zip(kinds, lefts, tops)]
+
+    def draw(self, surface):
+        return surface.blits(self.blit_list(surface.get_rect()))
+
+def add_random_entities(store, total_time, scroll_speed, now, rng=random, desired_objects=None):
+    '''The entity store version of floatipop.add_random_objects, drawing the
+    same numbers from rng as the Star, Whale and Balloon make() methods.'''
+    if desired_objects is None:
+        desired_objects = rng.randint(5, 5 + int(total_time * .15))
+    while len(store) < desired_objects:
+        # create a random object
+        objs = [STAR] * 45 + [BALLOON] * 1 + [WHALE] * 4
+        t = rng.choice(objs)
+        if t == STAR:
+            pos = (rng.randint(-50, -5), rng.randint(15, HEIGHT - 45))
+            vert_speed = rng.randint(25, 100)
+            displacement = rng.randint(0, HEIGHT - pos[1] - 45)
+            direction = rng.choice((-1, 1))
+            store.spawn(STAR, pos[0] + 16, pos[1] + 16, now, vert_speed, displacement, direction)
+        elif t == WHALE:
+            pos = (rng.randint(-200, -150), rng.randint(45, HEIGHT - 45))
+            store.spawn(WHALE, pos[0], pos[1], now)
+        else:
+            x = rng.randint(-10, -5)
+            y = rng.randint(15, 150)
+            store.spawn(BALLOON, x, HEIGHT - y, now, 160.0)
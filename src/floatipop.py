@@ -17,15 +17,27 @@
 # Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301  USA.
 
 import os
+import sys
 import time
 import math
 import random
 import copy
+import socket
+import threading
 
 import pygame
 from pygame.locals import *
 
 from .Singleton import Singleton
+from .assets import Assets
+from .spatialhash import nearby
+from .render import Renderer, DirtyRenderer
+from .text import NumberText, ScoreTable
+from .scheduler import Scheduler
+from .profiler import Profiler, Timeline
+from .scores import ScoreStore
+from .persist import Writer, write_json
+from .leaderboard import Leaderboard
 
 WIDTH = 1024
 HEIGHT = 768
@@ -39,35 +51,209 @@ MODE = MENU
 
 DATA_DIR = 'data'
 
-def load_image(name, colorkey=None, convert=True):
-    fullname = os.path.join(DATA_DIR, name)
-    try:
-        image = pygame.image.load(fullname)
-    except (pygame.error, message):
-        print('Cannot load image:', fullname)
-        raise SystemExit(message)
-    if convert:
-        image = image.convert()
-    if colorkey is not None:
-        if colorkey is -1:
-            colorkey = image.get_at((0,0))
-        image.set_colorkey(colorkey, RLEACCEL)
+# idle screens wake up at least this often (in ms) while waiting for input
+IDLE_TIMEOUT = 1000
+# posted when the shared high score table changes
+LEADERBOARD_EVENT = pygame.USEREVENT + 1
+# events that mean the window contents were lost and need drawing again
+REDRAW_EVENTS = (pygame.VIDEOEXPOSE, pygame.ACTIVEEVENT, getattr(pygame, 'WINDOWEXPOSED', pygame.VIDEOEXPOSE),
+                 LEADERBOARD_EVENT)
+
+# toggles the profiler overlay during a game
+PROFILER_KEY = pygame.K_F3
+# the frame profiler, created by --profile or the first time the overlay
+# is turned on
+profiler = None
+
+# text caches, created the first time they are needed
+score_text = None
+score_table = None
+# fonts by size, the font module is only started for the first one
+fonts = {}
+
+# when each step of starting up finished, counted from this module being
+# imported.  --startup-report prints it on exit, and with a file name adds
+# it to that file too
+startup = Timeline()
+STARTUP_REPORT = None
+
+# loads the music in the background, see start_music()
+music_thread = None
+
+# only repaint the parts of the screen that changed instead of flipping
+# the whole thing every frame
+DIRTY_RECTS = False
+# how many times a second the background and clouds are composited, the
+# rest of the time the last composite is reused.  0 repaints them whenever
+# they move
+SKY_FPS = 30
+
+# directory every game's input is recorded to (--record), None to not
+# record.  see replay.py
+RECORD_DIR = None
+
+# keep the stars, whales and balloons in the numpy entity store instead of
+# a sprite each (--entities).  see entities.py
+ENTITIES = False
+
+# leaderboard server shared by every cabinet (--leaderboard), None to only
+# keep scores here, and the name this cabinet goes by.  see leaderboard.py
+LEADERBOARD_URL = None
+CABINET = socket.gethostname()
+
+# (name, colorkey, convert, flipped) of every image a game needs
+GAME_IMAGES = [('background.png', None, True, False),
+               ('water.png', -1, True, False),
+               ('clouds.png', -1, True, False),
+               ('balloon1.png', -1, True, False),
+               ('whale.png', -1, False, False),
+               ('star.png', -1, False, False),
+               ('platform.png', -1, False, False),
+               ('blank.png', -1, True, False),
+               ]
+for i in range(4):
+    for j in range(5):
+        GAME_IMAGES.append(('shrimp-%d-%d.png' % (i, j), -1, False, False))
+        GAME_IMAGES.append(('shrimp-%d-%d.png' % (i, j), -1, False, True))
+
+MENU_IMAGES = [('menu.png', None, True, False),
+               ('highscores.png', None, True, False),
+               ]
+
+def user_dir():
+    '''Where we keep high scores and anything else written per user.'''
+    prefix = os.path.expanduser('~')
+    if os.name == 'nt': # windows
+        prefix = os.environ.get('APPDATA', '.')
+
+    return os.path.join(prefix, '.floatipop')
+
+def load_image(name, colorkey=None, convert=True, flipped=False):
+    image = Assets().image(os.path.join(DATA_DIR, name), colorkey, convert, flipped)
     return image, image.get_rect()
 
-def main():
-    pygame.init()
-    pygame.mixer.init()
-    pygame.font.init()
+def preload_images(images, wait=False, done=None):
+    Assets().preload([(os.path.join(DATA_DIR, name), colorkey, convert, flipped)
+                      for name, colorkey, convert, flipped in images], wait, done)
+
+def load_font(size):
+    font = fonts.get(size)
+    if font is None:
+        if not pygame.font.get_init():
+            pygame.font.init()
+        font = pygame.font.Font(None, size)
+        fonts[size] = font
+        startup.mark('font %d' % size)
+    return font
+
+def start_music():
+    '''Open the mixer, then load and start the music on a thread of its
+    own.  Called once the menu is on screen: SDL wants its subsystems
+    started from the main thread, but the module can load in the
+    background.'''
+    global music_thread
+    if music_thread is not None:
+        return
+    try:
+        pygame.mixer.init()
+    except pygame.error as message:
+        print('No music:', message)
+        return
+    startup.mark('mixer')
+
+    def run():
+        try:
+            pygame.mixer.music.load(os.path.join(DATA_DIR, 'battleofsteel.xm'))
+            pygame.mixer.music.play(-1)
+            startup.mark('music')
+        except pygame.error as message:
+            print('No music:', message)
+
+    music_thread = threading.Thread(target=run, name='floatipop-music')
+    music_thread.daemon = True
+    music_thread.start()
+
+def int_option(arg, minimum):
+    '''The whole number after the = of --name=N, at least minimum.'''
+    name, value = arg.split('=', 1)
+    try:
+        n = int(value)
+    except ValueError:
+        usage_error('%s wants a whole number, not %r' % (name, value))
+    if n < minimum:
+        usage_error('%s must be at least %d, not %d' % (name, minimum, n))
+    return n
+
+def usage_error(message):
+    sys.stderr.write('floatipop: error: %s\n' % message)
+    sys.exit(2)
+
+def main(args=None):
+    global DIRTY_RECTS
+    global SKY_FPS
+    global RECORD_DIR
+    global ENTITIES
+    global LEADERBOARD_URL
+    global CABINET
+    global STARTUP_REPORT
+    global profiler
+    if args is None:
+        args = sys.argv[1:]
+    for arg in args:
+        if arg == '--dirty-rects':
+            DIRTY_RECTS = True
+        elif arg == '--full-flip':
+            DIRTY_RECTS = False
+        elif arg.startswith('--fps='):
+            Scheduler().configure(fps=int_option(arg, 1))
+        elif arg.startswith('--sky-fps='):
+            SKY_FPS = int_option(arg, 0)
+        elif arg.startswith('--wait='):
+            try:
+                Scheduler().configure(policy=arg[len('--wait='):])
+            except ValueError as message:
+                usage_error(message)
+        elif arg == '--profile':
+            try: # create a directory
+                os.makedirs(user_dir())
+            except OSError:
+                pass
+            profiler = Profiler(os.path.join(user_dir(), time.strftime('trace-%Y%m%d-%H%M%S.csv')))
+        elif arg.startswith('--profile='):
+            profiler = Profiler(arg[len('--profile='):])
+        elif arg == '--record':
+            RECORD_DIR = os.path.join(user_dir(), 'replays')
+        elif arg.startswith('--record='):
+            RECORD_DIR = arg[len('--record='):]
+        elif arg == '--entities':
+            from . import entities
+            if entities.numpy is None:
+                usage_error('--entities needs numpy')
+            ENTITIES = True
+        elif arg.startswith('--leaderboard='):
+            LEADERBOARD_URL = arg[len('--leaderboard='):]
+        elif arg.startswith('--cabinet='):
+            CABINET = arg[len('--cabinet='):]
+        elif arg == '--startup-report':
+            STARTUP_REPORT = True
+        elif arg.startswith('--startup-report='):
+            STARTUP_REPORT = arg[len('--startup-report='):]
+    startup.mark('arguments')
+
+    # only what the menu needs, the mixer is opened once the menu is up
+    # and fonts when they are first needed
+    pygame.display.init()
     screen = pygame.display.set_mode((WIDTH, HEIGHT))
     pygame.display.set_caption('Float-i-Pop')
+    # anything loaded before there was a display
+    Assets().normalize()
     pygame.mouse.set_visible(False)
+    startup.mark('display')
 
     # load high scores
     HighScore().load()
+    startup.mark('high scores')
 
-    # create some music
-    pygame.mixer.music.load(os.path.join(DATA_DIR, 'battleofsteel.xm'))
-    pygame.mixer.music.play(-1)
 
     modes = {MENU: do_menu_loop,
              GAME: do_game_loop,
@@ -77,247 +263,230 @@ def main():
     while not done:
         done = not modes[MODE](screen)
 
+    if music_thread is not None:
+        music_thread.join()
     pygame.quit()
 
+    if profiler is not None:
+        profiler.close()
+
     HighScore().save()
+    if profiler is not None:
+        stats = Writer().stats()
+        print('writer: %d writes (%d coalesced), latency avg %.1f ms max %.1f ms, queue depth max %d' % (
+            stats['writes'], stats['coalesced'], stats['latency_avg'] * 1000.0, stats['latency_max'] * 1000.0, stats['max_depth']))
+
+    if STARTUP_REPORT is not None:
+        print('startup:')
+        print(startup.report())
+        if STARTUP_REPORT is not True:
+            startup.save(STARTUP_REPORT)
+
+def wait_for_keys(draw, keys, debounce=.5, shown=None):
+    '''Show a screen that does not change until one of keys is pressed.
+
+    draw() is called once and again only when the window needs repainting,
+    in between we sleep on the event queue.  Keys are ignored for the first
+    debounce seconds so a key still held from the last screen doesn't skip
+    this one.  shown() is called once the screen is up.  Returns the key
+    pressed, or None if the window was closed.'''
+    draw()
+    pygame.display.flip()
+    startup.mark('first frame', once=True)
+    if shown is not None:
+        shown()
+
+    start_time = time.time()
+    while 1:
+        remaining = debounce - (time.time() - start_time)
+        if remaining > 0:
+            # wake up when the debounce is over to catch held keys
+            event = pygame.event.wait(int(remaining * 1000) + 1)
+        else:
+            event = pygame.event.wait(IDLE_TIMEOUT)
+
+        if event.type == pygame.QUIT:
+            return None
+
+        if event.type in REDRAW_EVENTS:
+            draw()
+            pygame.display.flip()
+
+        if time.time() - start_time > debounce:
+            pressed_list = pygame.key.get_pressed()
+            for key in keys:
+                if pressed_list[key]:
+                    return key
 
 def do_menu_loop(screen):
     global MODE
     background, background_rect = load_image('menu.png')
-    
-    clock = pygame.time.Clock()
-    pressed_time = time.time()
-    while 1:
-        clock.tick(60)
-        current_time = time.time()
 
-        if pygame.event.peek(pygame.QUIT):
-            return False # quit
-
-        pressed_list = pygame.key.get_pressed()
-        if current_time - pressed_time > .5:
-            if pressed_list[pygame.K_ESCAPE]:
-                return False
-            elif pressed_list[pygame.K_SPACE] or pressed_list[pygame.K_RETURN]:
-                break
+    # get everything a game needs off the disk while we sit here
+    preload_images(MENU_IMAGES + GAME_IMAGES, done=lambda: startup.mark('game images', once=True))
 
+    def draw():
         screen.blit(background, (0, 0))
 
-        pygame.display.flip()
+    # the music starts once the menu is showing
+    key = wait_for_keys(draw, (pygame.K_ESCAPE, pygame.K_SPACE, pygame.K_RETURN), shown=start_music)
+    if key is None or key == pygame.K_ESCAPE:
+        return False # quit
 
     MODE = GAME
     return True
 
+def render_hud(score_text, player):
+    text = score_text.render(player.score)
+    return text, (10, 5)
+
 def do_game_loop(screen):
     global MODE
-
-    # reset the scroll speed
-    scroll_speed = 10.0
+    global profiler
+    from .simulation import Simulation
+    from .replay import Recorder
 
     # create a background
     background, background_rect = load_image('background.png')
 
-    water, water_rect = load_image('water.png')
-
-    # create the basic world
-    world_rects = []
-    left_rect = pygame.Rect(-5, 0, 5, HEIGHT)
-    right_rect = pygame.Rect(WIDTH, 0, 5, HEIGHT)
-    ceiling_rect = pygame.Rect(0, -5, WIDTH, 5)
-    world_rects = [left_rect, right_rect, ceiling_rect]
-
-    # offscreen rect to delete old objects
-    delete_rect = pygame.Rect(1500, 0, 5, HEIGHT)
-
     screen.blit(background, (0, 0))
     pygame.display.flip()
 
-    # create the scrolling sprites
-    foreground_scrolling_sprites = pygame.sprite.Group()
-    background_scrolling_sprites = pygame.sprite.Group()
-    for i in range(0, WIDTH + 88, 88):
-        foreground_scrolling_sprites.add(Water(i + 44, HEIGHT - (31 / 2) + 10, scroll_speed, math.pi / 2.5, 5.0 + (random.random())))
-    for i in range(0, WIDTH + 88, 88):
-        foreground_scrolling_sprites.add(Water(i, HEIGHT - (31 / 2) + 5, scroll_speed, 5.0 + (3.0 * random.random())))
-    # clouds
-    for i in range(0, 7):
-        background_scrolling_sprites.add(Cloud(random.randint(-WIDTH, WIDTH * 2), random.randint(75, 350), scroll_speed))
-
-    # objects
-    object_sprites = pygame.sprite.Group()
-
-    # movable world
-    movable_sprites = pygame.sprite.Group()
-    #movable_sprites.add(Platform(800, HEIGHT - 415, scroll_speed))
-
-    # create a player
-    player = Player(scroll_speed)
-    player_sprites = pygame.sprite.RenderPlain((player))
+    # create the world, the simulation owns everything that moves.  seeded
+    # explicitly so a recording of the game can recreate it
+    sim = Simulation(seed=random.getrandbits(32), scenery=True, entities=ENTITIES)
+    player = sim.player
+    player.verbose = True
+    #sim.movable_sprites.add(Platform(800, HEIGHT - 415, sim.scroll_speed))
 
     # create hud
-    font = pygame.font.Font(None, 36)
+    global score_text
+    if score_text is None:
+        score_text = NumberText(load_font(36), "Score: ", (220, 220, 220))
+
+    if DIRTY_RECTS:
+        renderer = DirtyRenderer(screen, background, SKY_FPS)
+    else:
+        renderer = Renderer(screen, background, SKY_FPS)
+
+    # only time anything while somebody is looking at the profile
+    def attach_profiler():
+        if profiler is not None and profiler.active():
+            timer = profiler
+        else:
+            timer = None
+        sim.timer = timer
+        renderer.timer = timer
+    attach_profiler()
+    overlay_key_down = False
 
     pygame.key.set_repeat(500, 30)
-    clock = pygame.time.Clock()
-    start_time = time.time()
-    last_time = time.time()
+    scheduler = Scheduler()
+    scheduler.reset()
 
-    while 1:
-        clock.tick(60)
-        current_time = time.time()
+    recorder = None
+    if RECORD_DIR is not None:
+        recorder = Recorder(sim)
+        sim.recorder = recorder
 
-        # "peek" at the event queue to see if there are any QUIT messages
-        if pygame.event.peek(pygame.QUIT):
-            return False
-        
-        pygame.event.pump()  # Let pygame handle all other messages.
-        # ...Look at keypresses
-        pressed_list = pygame.key.get_pressed()
-        if pressed_list[pygame.K_ESCAPE]:
-            break
+    try:
+        while 1:
+            dt = scheduler.tick()
+            timer = sim.timer
+            if timer is not None:
+                timer.end_frame(dt)
+                start = time.perf_counter()
+
+            # "peek" at the event queue to see if there are any QUIT messages
+            if pygame.event.peek(pygame.QUIT):
+                return False
         
-        # start increasing the scroll speed
-        if current_time - start_time > 25 and scroll_speed > 5: # 25 seconds
-            scroll_speed -= (current_time - last_time) * .1
-            # update all the objects
-            player.scroll_speed = scroll_speed
-            for object in foreground_scrolling_sprites:
-                object.scroll_speed = scroll_speed
-            for object in background_scrolling_sprites:
-                object.scroll_speed = scroll_speed
-            for object in object_sprites:
-                object.scroll_speed = scroll_speed
-
-        # handle input
-        player.handle_keys(pressed_list)
-
-        # create new objects
-        add_random_objects(object_sprites, current_time - start_time, scroll_speed)
-
-        # update everyone
-        player_sprites.update()
-        foreground_scrolling_sprites.update()
-        background_scrolling_sprites.update()
-        object_sprites.update()
-        movable_sprites.update()
-
-        # check for collision
-        player.check_collision(world_rects, movable_sprites, object_sprites)
-        # game over?
-        if player.balloons <= 0:
-            c_t = time.time()
-            l_t = time.time()
-            while player.do_death(c_t - l_t):
-                l_t = c_t
-                c_t = time.time()
-
-                if pygame.event.peek(pygame.QUIT):
-                    return False
+            pygame.event.pump()  # Let pygame handle all other messages.
+            # ...Look at keypresses
+            pressed_list = pygame.key.get_pressed()
+            if pressed_list[pygame.K_ESCAPE]:
+                break
+
+            # toggle the profiler overlay
+            if pressed_list[PROFILER_KEY] and not overlay_key_down:
+                if profiler is None:
+                    profiler = Profiler()
+                profiler.overlay = not profiler.overlay
+                attach_profiler()
+                timer = None
+            overlay_key_down = pressed_list[PROFILER_KEY]
+
+            if timer is not None:
+                timer.add('input', time.perf_counter() - start)
+
+            # run however many ticks of the world fit in this frame
+            sim.advance(dt, pressed_list)
+
+            # game over?
+            if sim.game_over:
+                dt = 0.0
+                while player.do_death(dt):
+                    if pygame.event.peek(pygame.QUIT):
+                        return False
         
-                pygame.event.pump()  # Let pygame handle all other messages.
-                pressed_list = pygame.key.get_pressed()
-                if pressed_list[pygame.K_ESCAPE]:
-                    break
-
-                screen.blit(background, (0, 0))
-                # draw the scrolling background
-                background_scrolling_sprites.draw(screen)
-                # object
-                object_sprites.draw(screen)
-                movable_sprites.draw(screen)
-                # draw the player
-                player_sprites.draw(screen)
-                # draw the scrolling foreground
-                foreground_scrolling_sprites.draw(screen)
-
-                text = font.render("Score: %d" % player.score, 1, (220, 220, 220))
-                textpos = text.get_rect(centerx = background.get_width()/2)
-                textpos.topleft = (10, 5)
-                # draw the hud
-                screen.blit(text, textpos)
-
-                # flip the display
-                pygame.display.flip()
-
-            print('Game Over')
-            print('score is', int(player.score))
-            HighScore().addScore(int(player.score))
-
-            break
-
-        # check if scrolling sprites should be deleted
-        check_collision(delete_rect, object_sprites)
-        check_collision(delete_rect, movable_sprites)
-
-        text = font.render("Score: %d" % player.score, 1, (220, 220, 220))
-        textpos = text.get_rect(centerx = background.get_width()/2)
-        textpos.topleft = (10, 5)
-
-        # draw the background
-        screen.blit(background, (0, 0))
+                    pygame.event.pump()  # Let pygame handle all other messages.
+                    pressed_list = pygame.key.get_pressed()
+                    if pressed_list[pygame.K_ESCAPE]:
+                        break
 
-        # draw the scrolling background
-        background_scrolling_sprites.draw(screen)
-        # object
-        object_sprites.draw(screen)
-        movable_sprites.draw(screen)
-        # draw the player
-        player_sprites.draw(screen)
-        # draw the scrolling foreground
-        foreground_scrolling_sprites.draw(screen)
+                    renderer.draw(sim, render_hud(score_text, player))
+                    dt = scheduler.tick()
 
-        # draw the hud
-        screen.blit(text, textpos)
+                print('Game Over')
+                print('score is', int(player.score))
+                HighScore().addScore(int(player.score), sim.now)
 
-        # flip the display
-        pygame.display.flip()
+                break
 
-        last_time = current_time
+            # skip drawing if we are falling behind, the world keeps going
+            if scheduler.should_render():
+                overlay = None
+                if profiler is not None:
+                    overlay = profiler.draw_overlay(WIDTH)
+                renderer.draw(sim, render_hud(score_text, player), overlay)
+    finally:
+        if recorder is not None:
+            save_recording(recorder, player)
+        if profiler is not None and profiler.active():
+            stats = renderer.sky.stats()
+            print('sky cache: %d hits, %d repaints, %.1f hits/s' % (stats['hits'], stats['misses'], stats['hits_per_second']))
 
     MODE = HIGHSCORES
     return True
 
+def save_recording(recorder, player):
+    try: # create a directory
+        os.makedirs(RECORD_DIR)
+    except OSError:
+        pass
+    filename = os.path.join(RECORD_DIR, time.strftime('replay-%Y%m%d-%H%M%S.fpr'))
+    recorder.save(filename, player.score)
+    print('game recorded to', filename)
+
 def do_highscore_loop(screen):
     global MODE
+    global score_table
     highscores, highscores_rect = load_image('highscores.png')
-    
-    font = pygame.font.Font(None, 48)
-
-    clock = pygame.time.Clock()
-    pressed_time = time.time()
-    while 1:
-        clock.tick(60)
-        current_time = time.time()
-
-        if pygame.event.peek(pygame.QUIT):
-            return False
 
-        pressed_list = pygame.key.get_pressed()
-        if current_time - pressed_time > .5:
-            if pressed_list[pygame.K_ESCAPE] or pressed_list[pygame.K_SPACE] or pressed_list[pygame.K_RETURN]:
-                break
+    if score_table is None:
+        score_table = ScoreTable(load_font(48))
+    table = score_table
+    high_score = HighScore()
 
+    def draw():
         screen.blit(highscores, (0, 0))
 
-        # draw the high scores
-        start_pos = (130, 210)
-        skip_space = (400, 45)
-        found_current = False
-        for i, score in enumerate(HighScore().scores):
-            col = i / 10
-            row = i % 10
-
-            color = (255, 255, 255)
-            if score == HighScore().currentScore and not found_current:
-                found_current = True
-                color = (150, 150, 150)
-
-            text = font.render("%d) %d" % (i + 1, score), 1, color)
-            textpos = text.get_rect()
-            textpos.topleft = (start_pos[0] + col * skip_space[0], start_pos[1] + row * skip_space[1])
-            screen.blit(text, textpos)
+        # draw the high scores, only rendered again when they change
+        screen.blits(table.render(high_score.scores, high_score.currentScore))
 
-        pygame.display.flip()
+    key = wait_for_keys(draw, (pygame.K_ESCAPE, pygame.K_SPACE, pygame.K_RETURN))
+    if key is None:
+        return False
 
     MODE = MENU
     return True
@@ -325,24 +494,83 @@ def do_highscore_loop(screen):
 
 def check_collision(rect, sprite_group, dokill = True):
     delete_list = []
-    for i in sprite_group:
+    for i in nearby(sprite_group, rect):
         if rect.colliderect(i):
             delete_list.append(i)
 
     sprite_group.remove(delete_list)
 
-def add_random_objects(object_group, total_time, scroll_speed):
-    desired_objects = random.randint(5, 5 + int(total_time * .15))
+def collide_masks(image, rect, other_image, other_rect):
+    '''Whether the solid pixels of two images overlap, drawn at rect and
+    other_rect.  Only worth asking once the rects overlap.'''
+    assets = Assets()
+    offset = (other_rect.left - rect.left, other_rect.top - rect.top)
+    return assets.mask(image).overlap(assets.mask(other_image), offset) is not None
+
+def _sweep_axis(lo, hi, other_lo, other_hi, d):
+    # (enter, exit) times of a span moving by d over a fixed one
+    if d == 0:
+        if hi <= other_lo or lo >= other_hi:
+            return None
+        return (-float('inf'), float('inf'))
+    if d > 0:
+        return ((other_lo - hi) / float(d), (other_hi - lo) / float(d))
+    return ((other_hi - lo) / float(d), (other_lo - hi) / float(d))
+
+def sweep(start, end, other_start, other_end):
+    '''The first moment, from 0 to 1 over a tick, that a box moving from
+    rect start to end touches one moving from other_start to other_end,
+    or None if they never do.  This catches things that went right through
+    each other between two ticks.'''
+    # look at it from the other box, standing still where it ended up
+    dx = (end.left - start.left) - (other_end.left - other_start.left)
+    dy = (end.top - start.top) - (other_end.top - other_start.top)
+    left = start.left + other_end.left - other_start.left
+    top = start.top + other_end.top - other_start.top
+
+    x = _sweep_axis(left, left + start.width, other_end.left, other_end.right, dx)
+    if x is None:
+        return None
+    y = _sweep_axis(top, top + start.height, other_end.top, other_end.bottom, dy)
+    if y is None:
+        return None
+
+    enter = max(x[0], y[0])
+    leave = min(x[1], y[1])
+    if enter >= leave or enter > 1 or leave <= 0:
+        return None
+    return max(enter, 0.0)
+
+def moved_far(start, end):
+    '''Whether a box moved at least its own size going from rect start to
+    end.  Two boxes that both moved less can't have gone clean through
+    each other, so need no sweep.'''
+    return abs(end.left - start.left) >= end.width or abs(end.top - start.top) >= end.height
+
+def add_random_objects(object_group, total_time, scroll_speed, rng=random, pools=None, desired_objects=None):
+    if desired_objects is None:
+        desired_objects = rng.randint(5, 5 + int(total_time * .15))
     while len(object_group) < desired_objects:
         # create a random object
-        objs = [Star] * 45 + [Balloon] * 1 + [Whale] * 4
-        t = random.choice(objs)
-        object_group.add(t.make(scroll_speed))
+        t = rng.choice(SPAWN_TABLE)
+        pool = None
+        if pools is not None:
+            pool = pools.get(t)
+        object_group.add(t.make(scroll_speed, rng, pool))
 
 class GameObject(pygame.sprite.Sprite):
-    def do_collision(self, group, object):
+    # the pool we came from, if any
+    pool = None
+
+    def do_collision(self, group, object, now):
         return False
 
+    def remove_internal(self, group):
+        pygame.sprite.Sprite.remove_internal(self, group)
+        # out of every group means we are done, go back to the pool
+        if self.pool is not None and not self.alive():
+            self.pool.release(self)
+
 class ScrollingSprite(GameObject):
     image = None
     def __init__(self, scroll_speed):
@@ -351,18 +579,8 @@ class ScrollingSprite(GameObject):
         self.rect = None
         self.scroll_speed = scroll_speed
 
-        self.last_time = None
-
-    def update(self):
-        if self.last_time is None:
-            self.last_time = time.time()
-            return
-
-        current_time = time.time()
-        t = current_time - self.last_time
-        self.last_time = current_time
-
-        self.rect.move_ip(WIDTH / self.scroll_speed * t, 0)
+    def update(self, dt, now):
+        self.rect.move_ip(WIDTH / self.scroll_speed * dt, 0)
 
 class Platform(ScrollingSprite):
     def __init__(self, position_x, position_y, scroll_speed):
@@ -377,8 +595,9 @@ class Platform(ScrollingSprite):
         
 
 class Cloud(ScrollingSprite):
-    def __init__(self, position_x, position_y, scroll_speed):
+    def __init__(self, position_x, position_y, scroll_speed, rng=random):
         ScrollingSprite.__init__(self, scroll_speed)
+        self.rng = rng
 
         if Cloud.image is None:
             Cloud.image, r = load_image('clouds.png', -1)
@@ -388,11 +607,11 @@ class Cloud(ScrollingSprite):
         self.rect.centerx = position_x
         self.rect.centery = position_y
 
-    def update(self):
-        ScrollingSprite.update(self)
+    def update(self, dt, now):
+        ScrollingSprite.update(self, dt, now)
 
         if self.rect.centerx > WIDTH + (self.rect.width / 2):
-            self.rect.centerx = -(random.randint(self.rect.width / 2 + 10, self.rect.width / 2 + 250))
+            self.rect.centerx = -(self.rng.randint(self.rect.width // 2 + 10, self.rect.width // 2 + 250))
 
 class Balloon(ScrollingSprite):
     def __init__(self, position_x, position_y, scroll_speed):
@@ -403,6 +622,11 @@ class Balloon(ScrollingSprite):
 
         self.image = Balloon.image
         self.rect = self.image.get_rect()
+        self.spawn(position_x, position_y, scroll_speed)
+
+    def spawn(self, position_x, position_y, scroll_speed):
+        self.scroll_speed = scroll_speed
+
         self.rect.centerx = position_x
         self.rect.centery = position_y
 
@@ -411,62 +635,28 @@ class Balloon(ScrollingSprite):
 
         self.vert_speed = 160
 
-    def update(self):
-        if self.last_time is None:
-            self.last_time = time.time()
-            return
-        
-        current_time = time.time()
-        t = current_time - self.last_time
-        self.last_time = current_time
-
-        sin_x = math.sin(current_time * 7.0) * 10.0
-        self.offset_x += WIDTH / self.scroll_speed * t
+    def update(self, dt, now):
+        sin_x = math.sin(now * 7.0) * 10.0
+        self.offset_x += WIDTH / self.scroll_speed * dt
 
-        self.rect.move_ip(0, -self.vert_speed * t)
+        self.rect.move_ip(0, -self.vert_speed * dt)
         self.rect.centerx = self.initial_x + sin_x + self.offset_x
 
 
-    def do_collision(self, group, object):
+    def do_collision(self, group, object, now):
         r = object.do_add_balloon()
         if r:
             group.remove(self)
         return r
 
     @staticmethod
-    def make(scroll_speed):
-        x = random.randint(-10, -5)
-        y = random.randint(15, 150)
+    def make(scroll_speed, rng=random, pool=None):
+        x = rng.randint(-10, -5)
+        y = rng.randint(15, 150)
+        if pool is not None:
+            return pool.acquire(x, HEIGHT - y, scroll_speed)
         return Balloon(x, HEIGHT - y, scroll_speed)
 
-class Water(ScrollingSprite):
-    def __init__(self, position_x, position_y, scroll_speed, wave_offset = 0, wave_speed = 5.0):
-        ScrollingSprite.__init__(self, scroll_speed)
-
-        if Water.image is None:
-            Water.image, r = load_image('water.png', -1)
-
-        self.image = Water.image
-        self.rect = self.image.get_rect()
-        self.rect.centerx = position_x
-        self.rect.centery = position_y
-        self.start_y = position_y
-        self.wave_offset = wave_offset
-        self.wave_speed = wave_speed
-        
-        self.start_time = time.time()
-
-    def update(self):
-        ScrollingSprite.update(self)
-
-        # up and down
-        current_time = time.time()
-        self.rect.centery = self.start_y + (math.sin((current_time - self.start_time) * self.wave_speed + self.wave_offset) * 5.0)
-
-        # make us repeat
-        if self.rect.centerx > WIDTH + (self.rect.width / 2):
-           self.rect.centerx -= (WIDTH + self.rect.width)
-
 class Whale(ScrollingSprite):
     def __init__(self, position_x, position_y, scroll_speed):
         ScrollingSprite.__init__(self, scroll_speed)
@@ -476,6 +666,11 @@ class Whale(ScrollingSprite):
 
         self.image = Whale.image
         self.rect = self.image.get_rect()
+        self.spawn(position_x, position_y, scroll_speed)
+
+    def spawn(self, position_x, position_y, scroll_speed):
+        self.scroll_speed = scroll_speed
+
         self.rect.centerx = position_x
         self.rect.centery = position_y
 
@@ -483,38 +678,47 @@ class Whale(ScrollingSprite):
         self.start_y = position_y
         self.swim_speed = 1.2
 
-        self.start_time = time.time()
+        # set by the first update
+        self.start_time = None
 
-    def update(self):
-        if self.last_time is None:
-            self.last_time = time.time()
+    def update(self, dt, now):
+        if self.start_time is None:
+            self.start_time = now
             return
 
         # swim, i mean fly whale, fly!!
-        current_time = time.time()
-        t = current_time - self.last_time
+        t = now - self.start_time
 
         self.rect.centerx = WIDTH / self.scroll_speed * self.swim_speed * t
-        self.rect.centery = self.start_y + (math.sin((current_time - self.start_time) * 4.0) * 25.0)
+        self.rect.centery = self.start_y + (math.sin(t * 4.0) * 25.0)
 
-    def do_collision(self, group, object):
-        return object.do_hit(self)
+    def do_collision(self, group, object, now):
+        return object.do_hit(self, now)
 
     @staticmethod
-    def make(scroll_speed):
-        pos = (random.randint(-200, -150), random.randint(45, HEIGHT - 45))
+    def make(scroll_speed, rng=random, pool=None):
+        pos = (rng.randint(-200, -150), rng.randint(45, HEIGHT - 45))
 
+        if pool is not None:
+            return pool.acquire(pos[0], pos[1], scroll_speed)
         return Whale(pos[0], pos[1], scroll_speed)
 
 class Star(ScrollingSprite):
-    def __init__(self, rect, vert_speed, scroll_speed, vert_displacement, initial_direction = None):
+    def __init__(self, position_x, position_y, vert_speed, scroll_speed, vert_displacement, initial_direction = None):
         ScrollingSprite.__init__(self, scroll_speed)
 
         if Star.image is None:
             Star.image, r = load_image('star.png', -1, False)
 
         self.image = Star.image
-        self.rect = rect
+        self.rect = Rect(0, 0, 32, 32)
+        self.spawn(position_x, position_y, vert_speed, scroll_speed, vert_displacement, initial_direction)
+
+    def spawn(self, position_x, position_y, vert_speed, scroll_speed, vert_displacement, initial_direction = None):
+        self.scroll_speed = scroll_speed
+
+        self.rect.centerx = position_x
+        self.rect.centery = position_y
 
         self.start_pos_y = self.rect.centery
         self.vert_speed = vert_speed
@@ -529,33 +733,30 @@ class Star(ScrollingSprite):
         else:
             self.direction = initial_direction
 
-        self.last_time = None
-
-    def update(self):
-        if self.last_time is None:
-            self.last_time = time.time()
-            return
-
-        current_time = time.time()
-        t = current_time - self.last_time
-        self.last_time = current_time
-
-        self.rect.move_ip(WIDTH / self.scroll_speed * t, self.vert_speed * t * self.direction)
+    def update(self, dt, now):
+        self.rect.move_ip(WIDTH / self.scroll_speed * dt, self.vert_speed * dt * self.direction)
         if self.direction == 1 and self.rect.centery - self.start_pos_y > self.vert_displacement:
             self.direction = -self.direction
         elif self.direction == -1 and self.rect.centery - self.start_pos_y <= 0:
             self.direction = -self.direction
 
-    def do_collision(self, group, object):
-        return object.do_hit(self)
+    def do_collision(self, group, object, now):
+        return object.do_hit(self, now)
 
     @staticmethod
-    def make(scroll_speed):
-        pos = (random.randint(-50, -5), random.randint(15, HEIGHT - 45))
-        vert_speed = random.randint(25, 100)
-        displacement = random.randint(0, HEIGHT - pos[1] - 45)
+    def make(scroll_speed, rng=random, pool=None):
+        pos = (rng.randint(-50, -5), rng.randint(15, HEIGHT - 45))
+        vert_speed = rng.randint(25, 100)
+        displacement = rng.randint(0, HEIGHT - pos[1] - 45)
+        direction = rng.choice((-1, 1))
 
-        return Star(Rect(pos[0], pos[1], 32, 32), vert_speed, scroll_speed, displacement)
+        # pos is the top left corner
+        if pool is not None:
+            return pool.acquire(pos[0] + 16, pos[1] + 16, vert_speed, scroll_speed, displacement, direction)
+        return Star(pos[0] + 16, pos[1] + 16, vert_speed, scroll_speed, displacement, direction)
+
+# what add_random_objects picks from
+SPAWN_TABLE = [Star] * 45 + [Balloon] * 1 + [Whale] * 4
 
 class Player(pygame.sprite.Sprite):
     MAX_FORCE_X = 150.0
@@ -575,7 +776,8 @@ class Player(pygame.sprite.Sprite):
             l = []
             for j in range(Player.NUM_ANIMATIONS):
                 img = load_image('shrimp-%d-%d.png' % (i, j), -1, False)
-                l.append((img[0], pygame.transform.flip(img[0], 1, 0)))
+                flipped_img = load_image('shrimp-%d-%d.png' % (i, j), -1, False, True)
+                l.append((img[0], flipped_img[0]))
             self.images[i] = l
         # flipped images
         self.blank_image = load_image('blank.png', -1)
@@ -605,30 +807,35 @@ class Player(pygame.sprite.Sprite):
 
         self.on_ground = True
 
-        # keey track of some time
-        self.last_flap = time.time()
-        self.last_time = None
+        # where the collision rect was at the start of the tick
+        self.previous_rect = None
+
+        # say so on stdout when dying, only wanted when someone is playing
+        self.verbose = False
+
+        # keey track of some time, the world's clock starts at 0
+        self.last_flap = 0.0
         self.total_time = 0
 
-        self.invincible = time.time()
+        self.invincible = 0.0
         self.balloons = 3
         self.score = 0.0
 
         self.reset()
 
-    def reset(self):
+    def reset(self, now=0.0):
         self.balloons = 3
         self.score = 0.0
         self.space_up = True
 
-        self.reset_position()
+        self.reset_position(now)
 
         # start off with 3 balloons
         self.image_num = None
         self.set_image(3)
 
 
-    def handle_keys(self, key_list):
+    def handle_keys(self, key_list, now):
         self.x_dir = 0
         if key_list[pygame.K_LEFT]:
             if self.x_dir_prev == 1:
@@ -639,7 +846,7 @@ class Player(pygame.sprite.Sprite):
                 self.set_image(self.image_num, True)
             self.x_dir = 1
         if key_list[pygame.K_SPACE] and self.space_up:
-            if time.time() - self.last_flap > Player.FLAP_TIME: # we are ok to flag
+            if now - self.last_flap > Player.FLAP_TIME: # we are ok to flag
                 self.space_up = False
                 # store our new starting position
                 self.start_pos_x = self.current_pos_x
@@ -647,22 +854,22 @@ class Player(pygame.sprite.Sprite):
 
                 # apply some force
                 if self.x_dir == 0: # is the user pressing left or right?
-                    if time.time() - self.last_flap < Player.FLAP_TIME * 5.0:
+                    if now - self.last_flap < Player.FLAP_TIME * 5.0:
                         self.force_y += Player.FORCE_APPLIED  / 3.0 * 1.2
                     else:
                         self.force_y = Player.FORCE_APPLIED / 3.0 * 2.0
                 else:
                     # y gets 2/3 or force, x gets 1/3
-                    if time.time() - self.last_flap < Player.FLAP_TIME * 5.0:
+                    if now - self.last_flap < Player.FLAP_TIME * 5.0:
                         self.force_y += Player.FORCE_APPLIED / 3.0 * 1.0
                     else:
                         self.force_y = Player.FORCE_APPLIED / 3.0 * 2.0
                     self.force_x += self.x_dir * Player.FORCE_APPLIED / 3.0 * 2.0
 
                 # reset everything
-                self.last_flap = time.time()
-                if time.time() - self.animation_start_time >= Player.ANIMATION_STEP * (Player.NUM_ANIMATIONS - 2): # only reset if we aren't in an animation (last step = first)
-                    self.animation_start_time = time.time()
+                self.last_flap = now
+                if now - self.animation_start_time >= Player.ANIMATION_STEP * (Player.NUM_ANIMATIONS - 2): # only reset if we aren't in an animation (last step = first)
+                    self.animation_start_time = now
                     self.animation_num = 0
                 self.total_time = 0
         if not key_list[pygame.K_SPACE]: # space key is up
@@ -679,16 +886,12 @@ class Player(pygame.sprite.Sprite):
         if self.x_dir != 0:
             self.x_dir_prev = self.x_dir
 
-    def update(self):
-        if self.last_time is None:
-            self.last_time = time.time()
-            return
+    def update(self, dt, now):
+        self.previous_rect = self.collision_rect.copy()
 
-        current_time = time.time()
+        self.score += dt * 10.0
 
-        self.score += (current_time - self.last_time) * 10.0
-        
-        self.total_time += current_time - self.last_time
+        self.total_time += dt
 
         if self.on_ground and self.force_y == 0:
             dx = self.force_x * self.total_time
@@ -708,16 +911,16 @@ class Player(pygame.sprite.Sprite):
             self.current_pos_y = self.start_pos_y + dy
 
 
-        self.offset_x += float(WIDTH) / float(self.scroll_speed) * (current_time - self.last_time)
+        self.offset_x += float(WIDTH) / float(self.scroll_speed) * dt
 
         self.rect.center = (self.current_pos_x, HEIGHT - self.current_pos_y) # - HEIGHT to inverse
         self.collision_rect.center = self.rect.center
 
         # update the image for animation
-        self.do_animation()
+        self.do_animation(now)
 
-        if current_time - self.invincible < Player.INVINCIBLE_TIME:
-            if math.sin((current_time - self.invincible) * 100.0) > 0:
+        if now - self.invincible < Player.INVINCIBLE_TIME:
+            if math.sin((now - self.invincible) * 100.0) > 0:
                 self.image = self.current_image
             else:
                 self.image = self.blank_image[0]
@@ -725,17 +928,15 @@ class Player(pygame.sprite.Sprite):
             self.image = self.current_image
 
         if self.current_pos_y < 25: # dead
-            print('You Died')
+            if self.verbose:
+                print('You Died')
             self.balloons = 0
 
-        self.last_time = current_time
-
         self.on_ground = False
 
-    def do_animation(self):
-        current_time = time.time()
-        if current_time - self.animation_start_time < Player.ANIMATION_STEP * Player.NUM_ANIMATIONS:
-            if current_time - self.animation_start_time > Player.ANIMATION_STEP * (self.animation_num + 1):
+    def do_animation(self, now):
+        if now - self.animation_start_time < Player.ANIMATION_STEP * Player.NUM_ANIMATIONS:
+            if now - self.animation_start_time > Player.ANIMATION_STEP * (self.animation_num + 1):
                 self.animation_num += 1
                 if self.animation_num >= Player.NUM_ANIMATIONS:
                     self.animation_num = 0
@@ -772,7 +973,7 @@ class Player(pygame.sprite.Sprite):
         self.rect.center = (self.current_pos_x, HEIGHT - self.current_pos_y)
         self.collision_rect.center = self.rect.center
 
-    def reset_position(self):
+    def reset_position(self, now=0.0):
         self.offset_x = 0.0
 
         self.start_pos_x = 850.0
@@ -792,33 +993,103 @@ class Player(pygame.sprite.Sprite):
         self.on_ground = True
 
         # keey track of some time
-        self.last_flap = time.time()
-        #self.last_time = None
+        self.last_flap = now
         self.total_time = 0
 
-    def check_collision(self, static_world, movable_world, objects):
+    def move_back(self, t):
+        '''Put the shrimp where it was at time t (0 to 1) of the last tick.'''
+        start = self.previous_rect
+        end = self.collision_rect
+        x = start.centerx + (end.centerx - start.centerx) * t
+        y = start.centery + (end.centery - start.centery) * t
+        self.current_pos_x = x
+        self.current_pos_y = HEIGHT - y
+        self.rect.center = (x, y)
+        self.collision_rect.center = self.rect.center
+
+    def hit_on_the_way(self, rect, previous_rect=None):
+        '''Whether the collision rect went through rect during the last
+        tick.  Returns when it first touched, or None.'''
+        if self.previous_rect is None:
+            return None
+        if previous_rect is None:
+            previous_rect = rect
+        return sweep(self.previous_rect, self.collision_rect, previous_rect, rect)
+
+    def hits(self, image, rect, previous_rect=None, precise=True):
+        '''Whether the shrimp hit image, drawn at rect now and at
+        previous_rect when the tick started (None to not sweep).  Boxes
+        that touch are checked with the masks; the sweep alone only counts
+        when the two went clean through each other during the tick.'''
+        if precise:
+            if self.rect.colliderect(rect):
+                return collide_masks(self.current_image, self.rect, image, rect)
+        elif self.collision_rect.colliderect(rect):
+            return True
+        if previous_rect is None or self.previous_rect is None:
+            return False
+        if not (moved_far(previous_rect, rect) or moved_far(self.previous_rect, self.collision_rect)):
+            return False
+
+        t = self.hit_on_the_way(rect, previous_rect)
+        if t is None:
+            return False
+        if t > 0 or not precise:
+            return True
+        # touching as the tick started, ask the masks where both were then
+        start = self.rect.move(self.previous_rect.centerx - self.collision_rect.centerx,
+                               self.previous_rect.centery - self.collision_rect.centery)
+        return collide_masks(self.current_image, start, image, previous_rect)
+
+    def check_collision(self, static_world, movable_world, objects, now, precise=True, previous=None, reach=0):
+        '''previous maps objects near the shrimp to where their rect's top
+        left was at the start of the tick, and reach is the furthest any of
+        them can move in a tick.  With those, objects the shrimp passed
+        clean through between ticks count too; walls always do.'''
+        # walls don't move, so can only be gone through by a fast shrimp
+        fast = self.previous_rect is not None and moved_far(self.previous_rect, self.collision_rect)
+
         # check collision
         for r in static_world:
             if self.collision_rect.colliderect(r):
                 self.do_bounce(r, True)
                 break
+            if not fast:
+                continue
+            # only if it went through during the tick, touching from the
+            # start is a hit at the end of it too
+            t = self.hit_on_the_way(r)
+            if t is not None and t > 0:
+                self.move_back(t)
+                self.do_bounce(r, True)
+                break
 
-        for r in movable_world:
+        for r in nearby(movable_world, self.collision_rect):
             if self.collision_rect.colliderect(r):
                 self.do_bounce(r.rect, True)
                 break
 
-        for r in objects:
-            if self.collision_rect.colliderect(r):
-                if r.do_collision(objects, self):
-                    break
+        area = self.rect
+        if previous is not None and self.previous_rect is not None:
+            area = self.rect.union(self.previous_rect).inflate(reach * 2, reach * 2)
+
+        for r in nearby(objects, area):
+            if self.balloons <= 0:
+                break
+            previous_rect = None
+            if previous is not None:
+                previous_rect = Rect(previous.get(r, r.rect.topleft), r.rect.size)
+            if self.hits(r.image, r.rect, previous_rect, precise) and r.do_collision(objects, self, now):
+                break
             
-    def do_hit(self, by_object):
-        if time.time() - self.invincible < Player.INVINCIBLE_TIME: # still invincible
+    def do_hit(self, by_object, now):
+        if self.balloons <= 0: # already dead this tick
+            return False
+        if now - self.invincible < Player.INVINCIBLE_TIME: # still invincible
             return False
 
         # we are hit, update everything
-        self.invincible = time.time()
+        self.invincible = now
         
         self.balloons -= 1
         self.x_dir_prev = -1
@@ -889,60 +1160,94 @@ class Player(pygame.sprite.Sprite):
         self.force_y *= y_mult
         self.force_x *= x_mult
 
+        # stand where we were pushed out to, so the next tick starts there
+        self.rect.center = (self.current_pos_x, HEIGHT - self.current_pos_y)
+        self.collision_rect.center = self.rect.center
+
 
 class HighScore(Singleton):
+    '''The high score table, backed by a ScoreStore in the user's
+    directory, and the stats of this session.  Every score goes to disk
+    as soon as it is added, not just when the game exits, but the writing
+    is done by the Writer thread.'''
     def __init__(self):
         if not self._isFirstInit():
             return
 
-        self._prefix = os.path.expanduser('~')
-        if os.name == 'nt': # windows
-            self._prefix = os.environ.get('APPDATA', '.')
-
-        self._prefix = os.path.join(self._prefix, '.floatipop')
+        self._prefix = user_dir()
 
         self.currentScore = None
-        self.scores = []
+        self.store = None
+        self.leaderboard = None
+        self.session = {'started': time.time(),
+                        'games': 0,
+                        'play_time': 0.0,
+                        'best': None,}
+
+    @property
+    def scores(self):
+        # the shared table once the server has sent one, our own until then
+        if self.leaderboard is not None:
+            top = self.leaderboard.top()
+            if top is not None:
+                return top
+        if self.store is None:
+            return []
+        return self.store.top()
 
     def load(self):
+        self.store = ScoreStore(self._prefix)
+        self.store.open()
+        # the writer thread decides when the scores hit the disk
+        self.store.autoflush = False
+        Writer().checkpoint(self.store.flush)
+        Writer().checkpoint(self._save_session)
+        # now, so the checkpoints run even before the first score
+        Writer().start()
+        if LEADERBOARD_URL is not None:
+            self.leaderboard = Leaderboard(LEADERBOARD_URL, CABINET, self._prefix,
+                                           on_change=self._leaderboard_changed)
+            self.leaderboard.start()
+        print('current scores are', self.scores)
+
+    def _leaderboard_changed(self):
+        # wake up the high score screen to draw the new table
         try:
-            f = open(os.path.join(self._prefix, 'highscores.txt'), 'r')
-            self.scores = [int(x) for x in f.readlines()]
-            self.scores.sort(reverse = True)
-            print('current scores are', self.scores)
-        except IOError:
+            pygame.event.post(pygame.event.Event(LEADERBOARD_EVENT))
+        except pygame.error:
             pass
-    def save(self):
-        if len(self.scores) == 0:
-            return
 
-        try: # create a directory
-            os.makedirs(self._prefix)
-        except OSError:
-            pass
+    def save(self):
+        if self.leaderboard is not None:
+            self.leaderboard.close()
+        # let the writer finish, then close up on this thread
+        Writer().close()
+        if self.store is not None:
+            self.store.close()
 
-        print('save current scores are', self.scores)
-        f = open(os.path.join(self._prefix, 'highscores.txt'), 'w')
-        for i in self.scores:
-            f.write('%d\n' % i)
-        f.close()
+    def _save_session(self):
+        write_json(os.path.join(self._prefix, 'session.json'), dict(self.session))
 
-    def addScore(self, score):
+    def addScore(self, score, play_time=0.0):
         try:
             s = int(score)
+        except ValueError:
+            return
 
-            if len(self.scores) < 20:
-                self.scores.append(s)
-            else:
-                if s > self.scores[-1]:
-                    self.scores[-1] = s
-
-            print('add current scores are', self.scores)
-            self.currentScore = s
-            self.scores.sort(reverse = True)
+        self.currentScore = s
+        session = self.session
+        session['games'] += 1
+        session['play_time'] += play_time
+        if session['best'] is None or s > session['best']:
+            session['best'] = s
+
+        if self.store is not None:
+            self.store.add(s)
+            # a session's scores should survive the machine going down
+            Writer().submit('scores', self.store.flush)
+            Writer().submit('session', self._save_session)
+        if self.leaderboard is not None:
+            self.leaderboard.add(s)
 
-        except ValueError:
-            pass
-        
 if __name__ == '__main__':
     main()
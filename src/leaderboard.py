@@ -0,0 +1,353 @@
+#
+# Copyright (C) 2008 - Mark Dillavou
+# Copyright (C) 2008 - UAB Game Developers Club (www.uab.edu/gamedev/)
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2, or (at your option)
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301  USA.
+
+'''Keep a shared high score table on a leaderboard server.
+
+The server speaks JSON over HTTP:
+
+    POST /scores  {"cabinet": NAME, "scores": [[ID, SCORE, TIME], ...]}
+    GET  /top     the table, with an ETag so an unchanged one is a 304
+
+and both answer with {"top": [SCORE, ...], "games": N}.  Every score has
+an id of its own so one sent twice, after an answer got lost, is only
+counted once.  leaderboard_server.py is a stand-in server to test with.'''
+
+import os
+import json
+import time
+import uuid
+import random
+import threading
+import http.client
+from urllib.parse import urlsplit
+
+from .persist import Writer, write_json
+
+# send scores once this many are waiting, or the oldest has waited this
+# many seconds
+BATCH = 16
+BATCH_DELAY = 2.0
+# seconds between fetches of the table
+REFRESH = 30.0
+# seconds to wait after a failed request, doubled on every failure
+BACKOFF = 1.0
+MAX_BACKOFF = 60.0
+TIMEOUT = 5.0
+# how long close() keeps trying to send what is left
+CLOSE_TIMEOUT = 3.0
+TOP = 20
+
+# scores not sent yet, kept over a restart
+PENDING = 'leaderboard.json'
+
+class ConnectionPool(object):
+    '''Keep-alive connections to one server, handed out one per request.'''
+
+    def __init__(self, url, size=2, timeout=TIMEOUT):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port
+        self.path = parts.path.rstrip('/')
+        self.timeout = timeout
+        if parts.scheme == 'https':
+            self.factory = http.client.HTTPSConnection
+        else:
+            self.factory = http.client.HTTPConnection
+        self.size = size
+        self.idle = []
+        self.lock = threading.Lock()
+        self.opened = 0
+
+    def request(self, method, path, body=None, headers={}):
+        '''Returns (status, headers, decoded json or None).  A connection
+        that fails is thrown away, so the next request opens a new one.'''
+        with self.lock:
+            if self.idle:
+                connection = self.idle.pop()
+            else:
+                connection = self.factory(self.host, self.port, timeout=self.timeout)
+                self.opened += 1
+
+        headers = dict(headers)
+        if body is not None:
+            body = json.dumps(body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        try:
+            connection.request(method, self.path + path, body, headers)
+            response = connection.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            raise
+
+        if response.will_close:
+            connection.close()
+        else:
+            with self.lock:
+                if len(self.idle) < self.size:
+                    self.idle.append(connection)
+                    connection = None
+            if connection is not None:
+                connection.close()
+
+        result = None
+        if data and response.getheader('Content-Type', '').startswith('application/json'):
+            result = json.loads(data.decode('utf-8'))
+        return response.status, response, result
+
+    def close(self):
+        with self.lock:
+            for connection in self.idle:
+                connection.close()
+            self.idle = []
+
+class Leaderboard(object):
+    '''Sends this cabinet's scores to the server and keeps a copy of the
+    shared table, all on a thread of its own: add() and top() never wait
+    on the network.
+
+    Scores are sent in batches.  A failed send is tried again after a
+    backoff that doubles on every failure, the scores stay queued (and on
+    disk) until the server has them.  on_change() is called, from the
+    leaderboard thread, whenever the table changes.'''
+
+    def __init__(self, url, cabinet, directory=None, batch=BATCH, delay=BATCH_DELAY,
+                 refresh=REFRESH, on_change=None):
+        self.pool = ConnectionPool(url)
+        self.cabinet = cabinet
+        self.directory = directory
+        self.batch = batch
+        self.delay = delay
+        self.refresh = refresh
+        self.on_change = on_change
+
+        self.cond = threading.Condition()
+        self.pending = []
+        self.pending_since = 0.0
+        self.thread = None
+        self.closing = False
+        self.deadline = 0.0
+
+        # the table as the server last sent it
+        self.table = None
+        self.games = None
+        self.etag = None
+        self._top = None
+
+        self.failures = 0
+        self.retry_at = 0.0
+        self.next_fetch = 0.0
+
+        self.sent = 0
+        self.batches = 0
+        self.retries = 0
+        self.fetches = 0
+        self.not_modified = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+        self._load_pending()
+
+    def _pending_path(self):
+        if self.directory is None:
+            return None
+        return os.path.join(self.directory, PENDING)
+
+    def _load_pending(self):
+        path = self._pending_path()
+        if path is None:
+            return
+        try:
+            f = open(path, 'r')
+            try:
+                data = json.load(f)
+            finally:
+                f.close()
+        except (IOError, ValueError):
+            return
+        if data.get('cabinet') == self.cabinet:
+            self.pending = [tuple(s) for s in data['scores']]
+            self.pending_since = time.time() - self.delay
+
+    def _save_pending(self):
+        path = self._pending_path()
+        if path is None:
+            return
+        with self.cond:
+            scores = list(self.pending)
+        write_json(path, {'cabinet': self.cabinet, 'scores': scores})
+
+    def start(self):
+        if self.thread is not None:
+            return
+        self.closing = False
+        self.thread = threading.Thread(target=self._run, name='floatipop-leaderboard')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def add(self, score, when=None):
+        if when is None:
+            when = time.time()
+        with self.cond:
+            if not self.pending:
+                self.pending_since = time.time()
+            self.pending.append((uuid.uuid4().hex, int(score), int(when)))
+            self._top = None
+            self.cond.notify()
+        if self.directory is not None:
+            Writer().submit('leaderboard', self._save_pending)
+
+    def top(self, n=TOP):
+        '''The shared table, with the scores not sent yet in it too, or
+        None if the server has not been heard from.'''
+        top = self._top
+        if top is None:
+            with self.cond:
+                if self.table is None:
+                    return None
+                top = sorted(self.table + [s for i, s, w in self.pending], reverse=True)[:n]
+                self._top = top
+        return top
+
+    def _due(self, now):
+        '''What to do next and how long until then.'''
+        if self.pending and now >= self.retry_at:
+            if self.closing or len(self.pending) >= self.batch:
+                return 'send', 0.0
+            wait = self.pending_since + self.delay - now
+            if wait <= 0:
+                return 'send', 0.0
+        elif self.pending:
+            wait = self.retry_at - now
+        else:
+            wait = self.refresh
+        if self.closing:
+            if self.pending and self.retry_at < self.deadline:
+                return None, wait
+            return 'stop', 0.0
+        if now >= max(self.next_fetch, self.retry_at):
+            return 'fetch', 0.0
+        return None, min(wait, max(self.next_fetch, self.retry_at) - now)
+
+    def _run(self):
+        while 1:
+            with self.cond:
+                while 1:
+                    action, wait = self._due(time.time())
+                    if action is not None:
+                        break
+                    self.cond.wait(wait)
+                batch = self.pending[:self.batch]
+                closing = self.closing
+
+            if action == 'stop':
+                return
+            try:
+                if action == 'send':
+                    self._send(batch)
+                else:
+                    self._fetch()
+                self.failures = 0
+                self.retry_at = 0.0
+            except (OSError, http.client.HTTPException, ValueError) as e:
+                if closing and time.time() >= self.deadline:
+                    return
+                self.failures += 1
+                self.retries += 1
+                backoff = min(MAX_BACKOFF, BACKOFF * 2 ** (self.failures - 1))
+                # spread out cabinets that all lost the server at once
+                self.retry_at = time.time() + backoff * random.uniform(.5, 1.0)
+                print('leaderboard: %s, trying again in %.0f s' % (e, self.retry_at - time.time()))
+
+    def _send(self, batch):
+        start = time.perf_counter()
+        status, response, result = self.pool.request('POST', '/scores',
+                                                     {'cabinet': self.cabinet, 'scores': batch})
+        latency = time.perf_counter() - start
+        if status >= 500:
+            raise http.client.HTTPException('server error %d' % status)
+
+        with self.cond:
+            sent = set([i for i, s, w in batch])
+            self.pending = [p for p in self.pending if p[0] not in sent]
+            if self.pending:
+                self.pending_since = time.time()
+        if status != 200:
+            # the server will never take these, don't keep trying
+            print('leaderboard: %d scores refused (%d)' % (len(batch), status))
+        else:
+            self.sent += len(batch)
+            self.batches += 1
+            self.latency_total += latency
+            self.latency_max = max(self.latency_max, latency)
+            self._set_table(result, response.getheader('ETag'))
+        if self.directory is not None and not self.closing:
+            Writer().submit('leaderboard', self._save_pending)
+
+    def _fetch(self):
+        headers = {}
+        if self.etag is not None:
+            headers['If-None-Match'] = self.etag
+        self.next_fetch = time.time() + self.refresh
+        status, response, result = self.pool.request('GET', '/top', headers=headers)
+        self.fetches += 1
+        if status == 304:
+            self.not_modified += 1
+        elif status == 200:
+            self._set_table(result, response.getheader('ETag'))
+        else:
+            raise http.client.HTTPException('server error %d' % status)
+
+    def _set_table(self, result, etag):
+        if result is None:
+            return
+        with self.cond:
+            changed = result['top'] != self.table
+            self.table = result['top']
+            self.games = result['games']
+            self.etag = etag
+            self._top = None
+        self.next_fetch = time.time() + self.refresh
+        if changed and self.on_change is not None:
+            self.on_change()
+
+    def close(self, timeout=CLOSE_TIMEOUT):
+        '''Keep trying to send what is left for up to timeout seconds, then
+        have the Writer keep anything still not sent on disk for next
+        time.'''
+        if self.thread is not None:
+            with self.cond:
+                self.closing = True
+                self.deadline = time.time() + timeout
+                self.cond.notify()
+            self.thread.join()
+            self.thread = None
+        self.pool.close()
+        if self.directory is not None:
+            Writer().submit('leaderboard', self._save_pending)
+
+    def stats(self):
+        return {'pending': len(self.pending),
+                'sent': self.sent,
+                'batches': self.batches,
+                'retries': self.retries,
+                'fetches': self.fetches,
+                'not_modified': self.not_modified,
+                'connections': self.pool.opened,
+                'latency_avg': self.batches and self.latency_total / self.batches or 0.0,
+                'latency_max': self.latency_max,}
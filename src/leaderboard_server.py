@@ -0,0 +1,271 @@
+#
+# Copyright (C) 2008 - Mark Dillavou
+# Copyright (C) 2008 - UAB Game Developers Club (www.uab.edu/gamedev/)
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2, or (at your option)
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301  USA.
+
+'''A stand-in leaderboard server, and a load test for it.
+
+    python -m floatipop.leaderboard_server [--port N] [--data DIR] [--fail P]
+    python -m floatipop.leaderboard_server --load-test [URL] [--clients N] [--scores N]
+
+The server keeps the scores in a ScoreStore in DIR (a temporary directory
+by default), and next to them the id of every score taken, so a score
+sent again after a restart is still only counted once.  --fail makes it
+answer that share of requests with an error, half of them after taking
+the scores in, to try out retries.  --load-test
+plays many cabinets at once against URL, or against a server of its own,
+and checks every score got there exactly once.'''
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .scores import ScoreStore
+from .leaderboard import Leaderboard, TOP
+
+# ids of the scores taken, one a line, kept with the scores
+SEEN = 'seen.log'
+
+class LeaderboardServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, store, fail=0.0):
+        ThreadingHTTPServer.__init__(self, address, Handler)
+        self.store = store
+        self.fail = fail
+        # ids of every score taken, so one sent again is not counted twice
+        self.seen = set()
+        self.seen_log = None
+        self.version = 0
+        self.requests = 0
+        self._load_seen()
+
+    def _load_seen(self):
+        path = os.path.join(self.store.directory, SEEN)
+        try:
+            f = open(path, 'r')
+            try:
+                self.seen = set([line.strip() for line in f if line.strip()])
+            finally:
+                f.close()
+        except IOError:
+            pass
+        self.seen_log = open(path, 'a')
+
+    def url(self):
+        host, port = self.server_address[:2]
+        return 'http://%s:%d' % (host, port)
+
+    def add(self, cabinet, scores):
+        '''Take scores in, and onto the disk before the answer goes out.
+        The scores go first: a crash in between can only count one twice,
+        never lose it.'''
+        store = self.store
+        with store.lock:
+            taken = []
+            for id, score, when in scores:
+                if id in self.seen:
+                    continue
+                self.seen.add(id)
+                store.add(int(score), when)
+                taken.append(id)
+            if not taken:
+                return
+            store.flush()
+            self.seen_log.write(''.join([id + '\n' for id in taken]))
+            self.seen_log.flush()
+            os.fsync(self.seen_log.fileno())
+            self.version += 1
+
+    def close(self):
+        self.shutdown()
+        with self.store.lock:
+            self.store.close()
+            self.seen_log.close()
+
+    def table(self):
+        with self.store.lock:
+            return self.version, {'top': list(self.store.top()), 'games': len(self.store)}
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def reply(self, status, data=None, etag=None):
+        body = b''
+        if data is not None:
+            body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        if data is not None:
+            self.send_header('Content-Type', 'application/json')
+        if etag is not None:
+            self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def reply_table(self, cached=True):
+        '''The table, or a 304 if cached and the client has it already.'''
+        version, table = self.server.table()
+        etag = '"%d"' % version
+        if cached and self.headers.get('If-None-Match') == etag:
+            self.reply(304, etag=etag)
+        else:
+            self.reply(200, table, etag)
+
+    def failing(self):
+        return self.server.fail and random.random() < self.server.fail / 2
+
+    def do_GET(self):
+        self.server.requests += 1
+        if self.path.rstrip('/').endswith('/top'):
+            self.reply_table()
+        else:
+            self.reply(404, {'error': 'no such thing'})
+
+    def do_POST(self):
+        self.server.requests += 1
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length)
+        if not self.path.rstrip('/').endswith('/scores'):
+            self.reply(404, {'error': 'no such thing'})
+            return
+        if self.failing():
+            self.reply(503, {'error': 'try again'})
+            return
+
+        try:
+            data = json.loads(body.decode('utf-8'))
+            cabinet = str(data['cabinet'])
+            scores = [(str(i), int(s), int(w)) for i, s, w in data['scores']]
+        except (ValueError, KeyError, TypeError):
+            self.reply(400, {'error': 'bad scores'})
+            return
+
+        self.server.add(cabinet, scores)
+        if self.failing():
+            # the scores are in, but the cabinet won't know that
+            self.reply(503, {'error': 'try again'})
+            return
+        self.reply_table(False)
+
+def serve(port=0, directory=None, fail=0.0, host='127.0.0.1'):
+    '''Start a server on a thread of its own, returns it.'''
+    store = ScoreStore(directory, top=TOP)
+    store.open()
+    server = LeaderboardServer((host, port), store, fail)
+    thread = threading.Thread(target=server.serve_forever, name='leaderboard-server')
+    thread.daemon = True
+    thread.start()
+    return server
+
+def load_test(url, clients, scores, delay):
+    '''clients cabinets each play scores games, as fast as they can.
+    Returns the cabinets.'''
+    cabinets = [Leaderboard(url, 'cabinet-%d' % i, delay=delay, refresh=1.0) for i in range(clients)]
+    for c in cabinets:
+        c.start()
+
+    def play(cabinet, seed):
+        rng = random.Random(seed)
+        for i in range(scores):
+            cabinet.add(rng.randint(0, 5000))
+            time.sleep(rng.uniform(0, delay / 4))
+
+    threads = [threading.Thread(target=play, args=(c, i)) for i, c in enumerate(cabinets)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    for c in cabinets:
+        c.close(timeout=60.0)
+    return cabinets
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog='floatipop.leaderboard_server', description=__doc__.split('\n')[0])
+    parser.add_argument('--port', type=int, default=8072)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--data', metavar='DIR', help='where to keep the scores')
+    parser.add_argument('--fail', type=float, default=0.0, help='share of requests to fail')
+    parser.add_argument('--load-test', nargs='?', const='', metavar='URL',
+                        help='play many cabinets against URL, or a server of our own')
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--scores', type=int, default=100, help='games per client')
+    parser.add_argument('--delay', type=float, default=.2, help='seconds a score may wait to be batched')
+    options = parser.parse_args(args)
+
+    directory = options.data
+    temporary = directory is None
+    if temporary:
+        directory = tempfile.mkdtemp(prefix='leaderboard-')
+
+    try:
+        if options.load_test is None:
+            server = serve(options.port, directory, options.fail, options.host)
+            print('serving on %s, scores in %s' % (server.url(), directory))
+            try:
+                while 1:
+                    time.sleep(3600)
+            except KeyboardInterrupt:
+                pass
+            server.close()
+            return 0
+
+        server = None
+        url = options.load_test
+        if not url:
+            server = serve(0, directory, options.fail)
+            url = server.url()
+
+        start = time.perf_counter()
+        cabinets = load_test(url, options.clients, options.scores, options.delay)
+        elapsed = time.perf_counter() - start
+
+        stats = [c.stats() for c in cabinets]
+        total = lambda key: sum([s[key] for s in stats])
+        batches = max(total('batches'), 1)
+        print('%d cabinets, %d scores in %.2f s (%.0f scores/s)' % (
+            options.clients, total('sent'), elapsed, total('sent') / elapsed))
+        print('%d batches (%.1f scores each), %d retries, %d fetches (%d unchanged), %d connections' % (
+            total('batches'), total('sent') / float(batches), total('retries'),
+            total('fetches'), total('not_modified'), total('connections')))
+        print('send latency avg %.1f ms, max %.1f ms' % (
+            sum([s['latency_avg'] * s['batches'] for s in stats]) / batches * 1000.0,
+            max([s['latency_max'] for s in stats]) * 1000.0))
+
+        expected = options.clients * options.scores
+        if server is None:
+            return 0
+        got = len(server.store)
+        print('server has %d games, %d requests, expected %d games: %s' % (
+            got, server.requests, expected, got == expected and 'ok' or 'WRONG'))
+        server.close()
+        return got != expected and 1 or 0
+    finally:
+        if temporary:
+            shutil.rmtree(directory, ignore_errors=True)
+
+if __name__ == '__main__':
+    sys.exit(main())
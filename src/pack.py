@@ -0,0 +1,107 @@
+#
+# Copyright (C) 2008 - Mark Dillavou
+# Copyright (C) 2008 - UAB Game Developers Club (www.uab.edu/gamedev/)
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2, or (at your option)
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301  USA.
+
+'''Pack the images of a data directory into an image bundle.
+
+    python -m floatipop.pack [DATA_DIR]
+    python -m floatipop.pack --compare [--repeat N] [DATA_DIR]
+
+Decodes every PNG in DATA_DIR (default data) into DATA_DIR/images.bundle,
+which the game then loads its images from.  Images missing from the
+bundle, or changed since it was packed, are still loaded from their own
+files until it is packed again.  --compare times loading every image the
+game uses from the files and from the bundle, each in a fresh process.'''
+
+import os
+import sys
+import glob
+import time
+import argparse
+import subprocess
+
+import pygame
+
+from . import floatipop as game
+from .floatipop import WIDTH, HEIGHT, preload_images
+from .assets import Assets
+from .bundle import BUNDLE, write_bundle
+
+def pack(directory):
+    '''Write the bundle of directory, returns (images, bytes).'''
+    images = []
+    for filename in sorted(glob.glob(os.path.join(directory, '*.png'))):
+        images.append((os.path.basename(filename), pygame.image.load(filename), filename))
+    filename = os.path.join(directory, BUNDLE)
+    write_bundle(filename, images)
+    return len(images), os.path.getsize(filename)
+
+def time_startup(bundled):
+    '''Seconds to load every image the game uses, onto a fresh display.'''
+    pygame.display.init()
+    pygame.display.set_mode((WIDTH, HEIGHT))
+    Assets().use_bundles = bundled
+    start = time.perf_counter()
+    preload_images(game.MENU_IMAGES + game.GAME_IMAGES, wait=True)
+    elapsed = time.perf_counter() - start
+    stats = Assets().stats()
+    pygame.quit()
+    return elapsed, stats['files'], stats['bundled']
+
+def compare(directory, repeat):
+    results = {}
+    for mode in ('loose', 'bundle'):
+        times = []
+        for i in range(repeat):
+            out = subprocess.check_output([sys.executable, '-m', __spec__.name, '--time', mode, directory])
+            elapsed, files, bundled = out.decode('ascii').split()[-3:]
+            times.append(float(elapsed))
+        times.sort()
+        results[mode] = times[len(times) // 2]
+        print('%-6s %7.1f ms (median of %d, %s files, %s from the bundle)' % (
+            mode, results[mode] * 1000.0, repeat, files, bundled))
+    print('the bundle loads %.1fx faster' % (results['loose'] / max(results['bundle'], 1e-9)))
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog='floatipop.pack', description=__doc__.split('\n')[0])
+    parser.add_argument('directory', nargs='?', default=game.DATA_DIR)
+    parser.add_argument('--compare', action='store_true', help='time loading the images both ways')
+    parser.add_argument('--repeat', type=int, default=5, help='runs of each way to take the median of')
+    parser.add_argument('--time', choices=('loose', 'bundle'), help=argparse.SUPPRESS)
+    options = parser.parse_args(args)
+    game.DATA_DIR = options.directory
+
+    if options.time:
+        elapsed, files, bundled = time_startup(options.time == 'bundle')
+        print(elapsed, files, bundled)
+        return 0
+
+    if options.compare:
+        if not os.path.exists(os.path.join(options.directory, BUNDLE)):
+            print('no %s in %s, pack it first' % (BUNDLE, options.directory))
+            return 1
+        compare(options.directory, options.repeat)
+        return 0
+
+    start = time.perf_counter()
+    count, size = pack(options.directory)
+    print('packed %d images, %.1f MB, into %s in %.2f s' % (
+        count, size / 1e6, os.path.join(options.directory, BUNDLE), time.perf_counter() - start))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
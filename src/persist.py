@@ -0,0 +1,147 @@
+#
+# Copyright (C) 2008 - Mark Dillavou
+# Copyright (C) 2008 - UAB Game Developers Club (www.uab.edu/gamedev/)
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2, or (at your option)
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301  USA.
+
+import os
+import json
+import time
+import queue
+import threading
+from collections import deque
+
+from .Singleton import Singleton
+
+QUEUE_SIZE = 64
+# seconds between checkpoints
+CHECKPOINT_INTERVAL = 30.0
+
+def write_json(path, data):
+    '''Replace the file at path with data, all or nothing.'''
+    temp = path + '.tmp'
+    f = open(temp, 'w')
+    json.dump(data, f, indent=1, sort_keys=True)
+    f.flush()
+    os.fsync(f.fileno())
+    f.close()
+    os.replace(temp, path)
+
+class Writer(Singleton):
+    '''Does every write to disk on a thread of its own, so the game never
+    waits on the disk.
+
+    submit() queues a named job.  A job submitted again before it got to
+    run is only run once, so bursts of the same write collapse into one.
+    Checkpoint jobs run every CHECKPOINT_INTERVAL seconds, and once more
+    when close() drains the queue at shutdown.  The queue is bounded, a
+    full queue makes submit() wait.'''
+
+    def __init__(self):
+        if not self._isFirstInit():
+            return
+
+        self.queue = queue.Queue(QUEUE_SIZE)
+        self.lock = threading.Lock()
+        self.queued = set()
+        self.checkpoints = []
+        self.interval = CHECKPOINT_INTERVAL
+        self.thread = None
+
+        self.submitted = 0
+        self.coalesced = 0
+        self.writes = 0
+        self.errors = 0
+        self.max_depth = 0
+        self.latencies = deque(maxlen=100)
+
+    def start(self):
+        if self.thread is not None:
+            return
+        self.thread = threading.Thread(target=self._run, name='floatipop-writer')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def submit(self, name, job):
+        '''Run job() on the writer thread, unless a job called name is
+        already waiting to.'''
+        self.start()
+        with self.lock:
+            self.submitted += 1
+            if name in self.queued:
+                self.coalesced += 1
+                return
+            self.queued.add(name)
+        self.queue.put((name, job, time.perf_counter()))
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+
+    def checkpoint(self, job):
+        '''Run job() every interval, and at shutdown, once the writer has
+        started.'''
+        self.checkpoints.append(job)
+
+    def _do(self, job, submitted=None):
+        try:
+            job()
+        except Exception as e:
+            self.errors += 1
+            print('write failed:', e)
+        self.writes += 1
+        if submitted is not None:
+            self.latencies.append(time.perf_counter() - submitted)
+
+    def _run(self):
+        next_checkpoint = time.time() + self.interval
+        while 1:
+            try:
+                item = self.queue.get(timeout=max(0.0, next_checkpoint - time.time()))
+            except queue.Empty:
+                item = False
+
+            if item is None:
+                break
+            if item:
+                name, job, submitted = item
+                with self.lock:
+                    self.queued.discard(name)
+                self._do(job, submitted)
+
+            if time.time() >= next_checkpoint:
+                for job in self.checkpoints:
+                    self._do(job)
+                next_checkpoint = time.time() + self.interval
+
+        # everything queued is done, checkpoint one last time
+        for job in self.checkpoints:
+            self._do(job)
+
+    def close(self):
+        '''Finish everything queued and stop the thread.'''
+        if self.thread is None:
+            return
+        self.queue.put(None)
+        self.thread.join()
+        self.thread = None
+
+    def stats(self):
+        latencies = list(self.latencies)
+        return {'depth': self.queue.qsize(),
+                'max_depth': self.max_depth,
+                'submitted': self.submitted,
+                'coalesced': self.coalesced,
+                'writes': self.writes,
+                'errors': self.errors,
+                'latency_avg': sum(latencies) / len(latencies) if latencies else 0.0,
+                'latency_max': max(latencies) if latencies else 0.0,}
@@ -0,0 +1,61 @@
+#
+# Copyright (C) 2008 - Mark Dillavou
+# Copyright (C) 2008 - UAB Game Developers Club (www.uab.edu/gamedev/)
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2, or (at your option)
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301  USA.
+
+class Pool(object):
+    '''Spare instances of one class, handed out again instead of building
+    new ones.
+
+    acquire(*args) takes the same arguments as the class constructor.  A
+    recycled instance gets them through its spawn() method, which has to
+    put it back in the state the constructor would have.  Whoever is done
+    with an instance gives it back with release().'''
+
+    def __init__(self, cls):
+        self.cls = cls
+        self.free = []
+        self.live = 0
+        self.high_water = 0
+        self.created = 0
+        self.reused = 0
+
+    def acquire(self, *args):
+        if self.free:
+            obj = self.free.pop()
+            obj.spawn(*args)
+            self.reused += 1
+        else:
+            obj = self.cls(*args)
+            self.created += 1
+        obj.pool = self
+
+        self.live += 1
+        if self.live > self.high_water:
+            self.high_water = self.live
+        return obj
+
+    def release(self, obj):
+        obj.pool = None
+        self.live -= 1
+        self.free.append(obj)
+
+    def stats(self):
+        return {'live': self.live,
+                'free': len(self.free),
+                'high_water': self.high_water,
+                'created': self.created,
+                'reused': self.reused,}
@@ -0,0 +1,201 @@
+#
+# Copyright (C) 2008 - Mark Dillavou
+# Copyright (C) 2008 - UAB Game Developers Club (www.uab.edu/gamedev/)
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2, or (at your option)
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301  USA.
+
+import json
+import math
+import time
+import threading
+from collections import deque
+
+import pygame
+from pygame.locals import *
+
+PHASES = ('input', 'spawn', 'update', 'collision', 'cleanup', 'draw', 'flip')
+COLUMNS = ('frame',) + PHASES
+PERCENTILES = (50, 95, 99)
+
+# frames averaged for the overlay, and how often it is redrawn
+OVERLAY_FRAMES = 60
+OVERLAY_REFRESH = 15
+OVERLAY_WIDTH = 230
+
+def percentile(values, p):
+    '''Nearest rank percentile of a sorted list.'''
+    if not values:
+        return 0.0
+    k = int(math.ceil(p / 100.0 * len(values))) - 1
+    return values[max(0, min(k, len(values) - 1))]
+
+class Profiler(object):
+    '''Collects how long each phase of every frame takes.
+
+    The simulation and renderer call add() while their timer is set to us,
+    the game loop calls end_frame() once a frame.  With a trace file every
+    frame is written out as a CSV row, and close() adds p50/p95/p99 of each
+    column in a .summary.json next to it.  The overlay shows the last
+    second or so of frames on screen.'''
+
+    def __init__(self, trace=None):
+        self.current = {}
+        self.recent = deque(maxlen=OVERLAY_FRAMES)
+        self.frames = 0
+
+        self.overlay = False
+        self.font = None
+        self.overlay_surface = None
+
+        self.trace = trace
+        self.trace_file = None
+        self.history = None
+        if trace is not None:
+            self.trace_file = open(trace, 'w')
+            self.trace_file.write(','.join(COLUMNS) + '\n')
+            self.history = dict([(c, []) for c in COLUMNS])
+
+    def active(self):
+        '''Whether anyone is looking at the numbers.'''
+        return self.overlay or self.trace_file is not None
+
+    def add(self, phase, seconds):
+        self.current[phase] = self.current.get(phase, 0.0) + seconds
+
+    def end_frame(self, frame_time):
+        row = self.current
+        row['frame'] = frame_time
+        self.current = {}
+        self.frames += 1
+        self.recent.append(row)
+
+        if self.trace_file is not None:
+            values = [row.get(c, 0.0) * 1000.0 for c in COLUMNS]
+            self.trace_file.write(','.join(['%.4f' % v for v in values]) + '\n')
+            for c, v in zip(COLUMNS, values):
+                self.history[c].append(v)
+
+    def averages(self):
+        '''Average ms of each column over the recent frames.'''
+        n = len(self.recent)
+        if n == 0:
+            return dict([(c, 0.0) for c in COLUMNS])
+        return dict([(c, sum([r.get(c, 0.0) for r in self.recent]) * 1000.0 / n) for c in COLUMNS])
+
+    def draw_overlay(self, screen_width):
+        '''The overlay as a (surface, position) to draw, or None when it is
+        turned off.'''
+        if not self.overlay:
+            return None
+
+        if self.overlay_surface is None or self.frames % OVERLAY_REFRESH == 0:
+            if self.font is None:
+                if not pygame.font.get_init():
+                    pygame.font.init()
+                self.font = pygame.font.Font(None, 20)
+            averages = self.averages()
+            frame = averages['frame']
+            fps = 1000.0 / frame if frame > 0 else 0.0
+
+            lines = [('frame %.2f ms  %.0f fps' % (frame, fps), None)]
+            for phase in PHASES:
+                lines.append(('%-9s %.3f ms' % (phase, averages[phase]), averages[phase] / frame if frame > 0 else 0.0))
+
+            line_height = self.font.get_linesize()
+            surface = pygame.Surface((OVERLAY_WIDTH, line_height * len(lines) + 8), SRCALPHA, 32)
+            surface.fill((0, 0, 0, 160))
+            for i, (text, share) in enumerate(lines):
+                y = 4 + i * line_height
+                if share is not None:
+                    bar = int((OVERLAY_WIDTH - 8) * min(share, 1.0))
+                    surface.fill((200, 80, 40, 200), (4, y + 2, bar, line_height - 4))
+                surface.blit(self.font.render(text, 1, (255, 255, 255)), (6, y))
+            self.overlay_surface = surface
+
+        return self.overlay_surface, (screen_width - OVERLAY_WIDTH - 5, 5)
+
+    def summary(self):
+        '''p50/p95/p99 in ms of every column of the trace.'''
+        summary = {'frames': self.frames}
+        if self.history is None:
+            return summary
+        for c in COLUMNS:
+            values = sorted(self.history[c])
+            summary[c] = dict([('p%d' % p, percentile(values, p)) for p in PERCENTILES])
+        return summary
+
+    def close(self):
+        if self.trace_file is None:
+            return
+        self.trace_file.close()
+        self.trace_file = None
+
+        summary = self.summary()
+        f = open(self.trace + '.summary.json', 'w')
+        json.dump(summary, f, indent=1, sort_keys=True)
+        f.close()
+
+        print('profile of %d frames written to %s' % (self.frames, self.trace))
+        for c in COLUMNS:
+            print('  %-9s p50 %.3f  p95 %.3f  p99 %.3f ms' % (c, summary[c]['p50'], summary[c]['p95'], summary[c]['p99']))
+
+class Timeline(object):
+    '''When each step of starting up finished, and on which thread.
+
+    Steps are marked from any thread.  report() lists them in order with
+    the time since start, and since the step before on the same thread.'''
+
+    def __init__(self, start=None):
+        if start is None:
+            start = time.perf_counter()
+        self.start = start
+        self.steps = []
+        self.lock = threading.Lock()
+
+    def mark(self, name, once=False):
+        '''Note that step name just finished.  With once set a step that
+        was already marked is not marked again.'''
+        now = time.perf_counter() - self.start
+        thread = threading.current_thread().name
+        with self.lock:
+            if once and name in [s[0] for s in self.steps]:
+                return
+            self.steps.append((name, now, thread))
+
+    def get(self, name):
+        '''Seconds from start to step name, or None.'''
+        for step, at, thread in self.steps:
+            if step == name:
+                return at
+        return None
+
+    def report(self):
+        with self.lock:
+            steps = sorted(self.steps, key=lambda s: s[1])
+        lines = ['%9s %9s  %-20s %s' % ('at ms', 'took ms', 'step', 'thread')]
+        last = {}
+        for name, at, thread in steps:
+            took = at - last.get(thread, 0.0)
+            last[thread] = at
+            lines.append('%9.1f %9.1f  %-20s %s' % (at * 1000.0, took * 1000.0, name, thread))
+        return '\n'.join(lines)
+
+    def save(self, filename):
+        '''Add this startup to filename, one JSON object per line, to
+        follow it from release to release.'''
+        f = open(filename, 'a')
+        f.write(json.dumps({'time': time.time(),
+                            'steps': [[name, round(at * 1000.0, 2), thread] for name, at, thread in self.steps],}) + '\n')
+        f.close()
@@ -0,0 +1,188 @@
+#
+# Copyright (C) 2008 - Mark Dillavou
+# Copyright (C) 2008 - UAB Game Developers Club (www.uab.edu/gamedev/)
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2, or (at your option)
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301  USA.
+
+import time
+
+import pygame
+
+def sky_layers(sim):
+    '''The slow layers behind everything else, back to front.'''
+    return [sim.background_scrolling_sprites]
+
+def world_layers(sim):
+    '''Everything in sim drawn on top of the sky, back to front.'''
+    layers = [sim.object_sprites]
+    if sim.entities is not None:
+        layers.append(sim.entities)
+    layers.extend((sim.movable_sprites, sim.player_sprites, sim.foreground_scrolling_sprites))
+    if sim.water is not None:
+        layers.append(sim.water)
+    return layers
+
+def blit_list(layer, bounds):
+    '''(image, rect) of everything in layer that shows inside bounds.'''
+    if isinstance(layer, pygame.sprite.AbstractGroup):
+        return [(s.image, s.rect) for s in layer if s.rect.colliderect(bounds)]
+    return layer.blit_list(bounds)
+
+def draw_layers(surface, layers, doreturn=True):
+    '''Draw layers back to front, leaving out whatever is off the surface.
+    Returns the rects drawn when doreturn is set.'''
+    bounds = surface.get_rect()
+    sequence = []
+    for layer in layers:
+        sequence.extend(blit_list(layer, bounds))
+    return surface.blits(sequence, doreturn)
+
+class Sky(object):
+    '''The background image with the slow layers (the clouds) composited
+    onto it, kept in a surface of its own.
+
+    The composite is only repainted when something in it moved a whole
+    pixel, and at most fps times a (simulated) second, every other frame
+    just blits the cached surface.  rects holds what changed on the last
+    repaint, where things were and where they are now.'''
+
+    def __init__(self, background, fps=None):
+        self.background = background
+        self.fps = fps
+        self.surface = background.copy()
+        self.positions = None
+        self.last_paint = None
+        self.rects = []
+
+        self.hits = 0
+        self.misses = 0
+        self.start = None
+        self.now = 0.0
+
+    def compose(self, layers, now):
+        '''The composite for the world at time now.  Returns whether it was
+        repainted.'''
+        if self.start is None:
+            self.start = now
+        self.now = now
+
+        positions = []
+        for layer in layers:
+            positions.extend([tuple(s.rect) for s in layer])
+
+        # (a hair under a whole period, so 30 fps of 60 fps ticks is every
+        # other tick despite the rounding)
+        if positions == self.positions or (self.fps and self.last_paint is not None and (now - self.last_paint) * self.fps < .999):
+            self.hits += 1
+            return False
+
+        surface = self.surface
+        surface.blit(self.background, (0, 0))
+        rects = draw_layers(surface, layers)
+        self.rects = [pygame.Rect(p) for p in self.positions or ()] + rects
+        self.positions = positions
+        self.last_paint = now
+        self.misses += 1
+        return True
+
+    def stats(self):
+        elapsed = 0.0
+        if self.start is not None:
+            elapsed = self.now - self.start
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'hits_per_second': self.hits / elapsed if elapsed > 0 else 0.0,}
+
+class Renderer(object):
+    '''Paints the whole screen and flips it every frame.
+
+    The background and clouds come from a Sky, repainted at most sky_fps
+    times a second (None for whenever they move).'''
+
+    def __init__(self, screen, background, sky_fps=None):
+        self.screen = screen
+        self.background = background
+        self.sky = Sky(background, sky_fps)
+        # same as Simulation.timer, gets the 'draw' and 'flip' times
+        self.timer = None
+
+    def draw(self, sim, hud, overlay=None):
+        screen = self.screen
+        timer = self.timer
+        if timer is not None:
+            start = time.perf_counter()
+
+        # draw the background and clouds
+        self.sky.compose(sky_layers(sim), sim.now)
+        screen.blit(self.sky.surface, (0, 0))
+
+        # draw the objects, the player and then the scrolling foreground
+        draw_layers(screen, world_layers(sim), False)
+
+        # draw the hud
+        screen.blit(hud[0], hud[1])
+        if overlay is not None:
+            screen.blit(overlay[0], overlay[1])
+
+        if timer is not None:
+            flip_start = time.perf_counter()
+            timer.add('draw', flip_start - start)
+
+        # flip the display
+        pygame.display.flip()
+
+        if timer is not None:
+            timer.add('flip', time.perf_counter() - flip_start)
+
+class DirtyRenderer(Renderer):
+    '''Only repaints the parts of the screen something moved over.
+
+    Every frame the areas drawn last frame are painted over with the sky,
+    everything is drawn again, and only those two sets of rects are sent
+    to the display.  When the sky was repainted the clouds' old and new
+    places go along too.  The first frame repaints everything.'''
+
+    def __init__(self, screen, background, sky_fps=None):
+        Renderer.__init__(self, screen, background, sky_fps)
+        self.previous = [screen.get_rect()]
+
+    def draw(self, sim, hud, overlay=None):
+        screen = self.screen
+        sky = self.sky
+        timer = self.timer
+        if timer is not None:
+            start = time.perf_counter()
+
+        # wipe out where things were, and where the clouds moved
+        sky_rects = []
+        if sky.compose(sky_layers(sim), sim.now):
+            sky_rects = sky.rects
+        surface = sky.surface
+        screen.blits([(surface, r, r) for r in self.previous + sky_rects], False)
+
+        rects = draw_layers(screen, world_layers(sim))
+        rects.append(screen.blit(hud[0], hud[1]))
+        if overlay is not None:
+            rects.append(screen.blit(overlay[0], overlay[1]))
+
+        if timer is not None:
+            flip_start = time.perf_counter()
+            timer.add('draw', flip_start - start)
+
+        pygame.display.update(self.previous + sky_rects + rects)
+        self.previous = rects
+
+        if timer is not None:
+            timer.add('flip', time.perf_counter() - flip_start)
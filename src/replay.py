@@ -0,0 +1,231 @@
+#
+# Copyright (C) 2008 - Mark Dillavou
+# Copyright (C) 2008 - UAB Game Developers Club (www.uab.edu/gamedev/)
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2, or (at your option)
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301  USA.
+
+'''Record games and play them back.
+
+    python -m floatipop.replay FILE [--headless] [--dirty-rects] [--data-dir DIR]
+
+A replay holds the seed of the world and the keys held on every tick, run
+length encoded, so playing it back through a Simulation gives exactly the
+same game.  --headless runs it as fast as possible and checks the final
+tick count and score against the ones recorded.'''
+
+import sys
+import time
+import struct
+
+import pygame
+
+from . import floatipop as game
+from .floatipop import WIDTH, HEIGHT, load_image, render_hud
+from .simulation import Simulation, KeyState, init_headless
+from .render import Renderer, DirtyRenderer
+from .scheduler import Scheduler
+from .text import NumberText
+from .assets import Assets
+
+MAGIC = b'FPOP'
+VERSION = 7
+
+# magic, version, flags, seed, tick length, ticks, runs, final score
+HEADER = struct.Struct('<4sHHQdIId')
+# ticks in the run, key mask
+RUN = struct.Struct('<HB')
+MAX_RUN = 0xffff
+
+# header flags
+ENTITIES = 1
+
+# key mask bits
+LEFT = 1
+RIGHT = 2
+FLAP = 4
+
+KEY_STATES = [KeyState(left=m & LEFT, right=m & RIGHT, flap=m & FLAP) for m in range(8)]
+
+def key_mask(pressed_list):
+    mask = 0
+    if pressed_list[pygame.K_LEFT]:
+        mask |= LEFT
+    if pressed_list[pygame.K_RIGHT]:
+        mask |= RIGHT
+    if pressed_list[pygame.K_SPACE]:
+        mask |= FLAP
+    return mask
+
+class Recorder(object):
+    '''Set as Simulation.recorder to keep the input of every tick.'''
+
+    def __init__(self, sim):
+        self.seed = sim.seed
+        self.tick = sim.tick
+        self.flags = 0
+        if sim.entities is not None:
+            self.flags |= ENTITIES
+        self.ticks = 0
+        self.runs = []
+
+    def record(self, pressed_list):
+        mask = key_mask(pressed_list)
+        runs = self.runs
+        if runs and runs[-1][1] == mask and runs[-1][0] < MAX_RUN:
+            runs[-1][0] += 1
+        else:
+            runs.append([1, mask])
+        self.ticks += 1
+
+    def save(self, filename, score):
+        f = open(filename, 'wb')
+        f.write(HEADER.pack(MAGIC, VERSION, self.flags, self.seed, self.tick, self.ticks, len(self.runs), score))
+        for count, mask in self.runs:
+            f.write(RUN.pack(count, mask))
+        f.close()
+
+class Replay(object):
+    '''A recorded game.'''
+
+    def __init__(self, seed, tick, inputs, flags=0, score=None):
+        self.seed = seed
+        self.tick = tick
+        self.inputs = inputs
+        self.flags = flags
+        self.score = score
+
+    @staticmethod
+    def load(filename):
+        f = open(filename, 'rb')
+        data = f.read()
+        f.close()
+
+        magic, version, flags, seed, tick, ticks, runs, score = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('%s is not a floatipop replay' % filename)
+
+        inputs = []
+        offset = HEADER.size
+        for i in range(runs):
+            count, mask = RUN.unpack_from(data, offset)
+            offset += RUN.size
+            inputs.extend([mask] * count)
+        if len(inputs) != ticks:
+            raise ValueError('%s is truncated' % filename)
+        return Replay(seed, tick, inputs, flags, score)
+
+    def __len__(self):
+        return len(self.inputs)
+
+    def simulation(self, scenery=False):
+        return Simulation(seed=self.seed, tick=self.tick, scenery=scenery,
+                          entities=bool(self.flags & ENTITIES))
+
+    def run(self, sim=None):
+        '''Play the whole replay as fast as possible.'''
+        if sim is None:
+            sim = self.simulation()
+        step = sim.step
+        for mask in self.inputs:
+            step(KEY_STATES[mask])
+        return sim
+
+    def matches(self, sim):
+        '''Whether sim ended up where the recorded game did.'''
+        return sim.ticks == len(self.inputs) and (self.score is None or abs(sim.player.score - self.score) < 1e-6)
+
+def watch(screen, replay, dirty=False):
+    '''Play replay back at the speed it was recorded, drawing every frame.
+    Escape stops it.  Returns the simulation.'''
+    background, r = load_image('background.png')
+    hud = NumberText(pygame.font.Font(None, 36), "Score: ", (220, 220, 220))
+
+    sim = replay.simulation(scenery=True)
+    sim.player.verbose = True
+    if dirty:
+        renderer = DirtyRenderer(screen, background, game.SKY_FPS)
+    else:
+        renderer = Renderer(screen, background, game.SKY_FPS)
+
+    scheduler = Scheduler()
+    scheduler.reset()
+    accumulator = 0.0
+    i = 0
+    while i < len(replay.inputs):
+        accumulator += scheduler.tick()
+
+        if pygame.event.peek(pygame.QUIT):
+            break
+        pygame.event.pump()
+        if pygame.key.get_pressed()[pygame.K_ESCAPE]:
+            break
+
+        while accumulator >= sim.tick and i < len(replay.inputs):
+            sim.step(KEY_STATES[replay.inputs[i]])
+            accumulator -= sim.tick
+            i += 1
+
+        renderer.draw(sim, render_hud(hud, sim.player))
+    return sim
+
+def main(args=None):
+    if args is None:
+        args = sys.argv[1:]
+
+    headless = False
+    dirty = False
+    filenames = []
+    i = 0
+    while i < len(args):
+        if args[i] == '--headless':
+            headless = True
+        elif args[i] == '--dirty-rects':
+            dirty = True
+        elif args[i] == '--data-dir':
+            i += 1
+            game.DATA_DIR = args[i]
+        else:
+            filenames.append(args[i])
+        i += 1
+
+    if not filenames:
+        print(__doc__)
+        return 2
+
+    status = 0
+    for filename in filenames:
+        replay = Replay.load(filename)
+        if headless:
+            init_headless()
+            start = time.perf_counter()
+            sim = replay.run()
+            elapsed = time.perf_counter() - start
+            ok = replay.matches(sim)
+            print('%s: %d ticks in %.2f s (%.0f ticks/s), score %d, %s' % (
+                filename, sim.ticks, elapsed, sim.ticks / max(elapsed, 1e-9),
+                sim.player.score, ok and 'matches' or 'DIFFERS from %d' % replay.score))
+            if not ok:
+                status = 1
+        else:
+            pygame.init()
+            screen = pygame.display.set_mode((WIDTH, HEIGHT))
+            pygame.display.set_caption('Float-i-Pop replay')
+            Assets().normalize()
+            watch(screen, replay, dirty)
+            pygame.quit()
+    return status
+
+if __name__ == '__main__':
+    sys.exit(main())
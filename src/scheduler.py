@@ -0,0 +1,122 @@
+#
+# Copyright (C) 2008 - Mark Dillavou
+# Copyright (C) 2008 - UAB Game Developers Club (www.uab.edu/gamedev/)
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2, or (at your option)
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301  USA.
+
+import time
+from collections import deque
+
+from .Singleton import Singleton
+
+# ways to wait out the rest of a frame
+SLEEP = 'sleep'   # give the cpu back, least accurate
+BUSY = 'busy'     # spin, most accurate and burns a core
+HYBRID = 'hybrid' # sleep most of it, spin the last SPIN_TIME
+POLICIES = (SLEEP, BUSY, HYBRID)
+
+SPIN_TIME = .002
+
+class Scheduler(Singleton):
+    '''The one frame clock every mode runs off.
+
+    tick() ends a frame: it notes how long the frame's work took against
+    the budget of 1 / fps, waits out the rest of the budget according to
+    the wait policy, and returns the seconds since the previous tick for
+    the simulation to consume.  When a frame goes over budget,
+    should_render() says to skip drawing the next one (at most max_skip in
+    a row) so the simulation can catch up instead of falling behind.'''
+
+    def __init__(self):
+        if not self._isFirstInit():
+            return
+
+        self.fps = 60
+        self.policy = SLEEP
+        self.max_skip = 2
+
+        self.work_times = deque(maxlen=120)
+        self.reset()
+
+    def configure(self, fps=None, policy=None, max_skip=None):
+        if fps is not None:
+            if fps <= 0:
+                raise ValueError('fps must be above 0, not %r' % (fps,))
+            self.fps = fps
+        if policy is not None:
+            if policy not in POLICIES:
+                raise ValueError('unknown wait policy %r' % (policy,))
+            self.policy = policy
+        if max_skip is not None:
+            self.max_skip = max_skip
+
+    def reset(self):
+        '''Start timing from now, so time spent outside the loop (loading,
+        sitting on the menu) doesn't show up as one enormous frame.'''
+        self.frame_start = time.perf_counter()
+        self.frames = 0
+        self.over_budget = 0
+        self.skipped = 0
+        self.skipped_in_row = 0
+        self.behind = False
+        self.work_times.clear()
+
+    def budget(self):
+        return 1.0 / self.fps
+
+    def _wait(self, deadline):
+        if self.policy != BUSY:
+            remaining = deadline - time.perf_counter()
+            if self.policy == HYBRID:
+                remaining -= SPIN_TIME
+            if remaining > 0:
+                time.sleep(remaining)
+        while time.perf_counter() < deadline:
+            pass
+
+    def tick(self):
+        now = time.perf_counter()
+        work = now - self.frame_start
+        self.work_times.append(work)
+
+        budget = self.budget()
+        self.behind = work > budget
+        if self.behind:
+            self.over_budget += 1
+        else:
+            self._wait(self.frame_start + budget)
+            now = time.perf_counter()
+
+        dt = now - self.frame_start
+        self.frame_start = now
+        self.frames += 1
+        return dt
+
+    def should_render(self):
+        if self.behind and self.skipped_in_row < self.max_skip:
+            self.skipped_in_row += 1
+            self.skipped += 1
+            return False
+        self.skipped_in_row = 0
+        return True
+
+    def stats(self):
+        work = list(self.work_times)
+        return {'frames': self.frames,
+                'over_budget': self.over_budget,
+                'skipped': self.skipped,
+                'budget': self.budget(),
+                'work_avg': sum(work) / len(work) if work else 0.0,
+                'work_max': max(work) if work else 0.0,}
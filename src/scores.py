@@ -0,0 +1,303 @@
+#
+# Copyright (C) 2008 - Mark Dillavou
+# Copyright (C) 2008 - UAB Game Developers Club (www.uab.edu/gamedev/)
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2, or (at your option)
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301  USA.
+
+import os
+import json
+import time
+import heapq
+import struct
+import bisect
+import datetime
+import threading
+
+LOG = 'scores.log'
+SNAPSHOT = 'scores.snap'
+# the old plain text table, read once if there is no log yet
+OLD_TABLE = 'highscores.txt'
+
+# time played (unix seconds), score
+RECORD = struct.Struct('<qi')
+SNAPSHOT_VERSION = 1
+
+TOP = 20
+# write out and fsync the log after this many scores or seconds, whichever
+# comes first
+SYNC_BATCH = 16
+SYNC_INTERVAL = 5.0
+# rewrite the snapshot once this many scores have been logged since the
+# last one, so opening never has much log to read
+SNAPSHOT_EVERY = 4096
+
+class ScoreStore(object):
+    '''Every score ever played, kept in a directory.
+
+    The log is only ever appended to, one fixed size record per score, and
+    is fsynced in batches.  The snapshot holds the top scores and the
+    history index as of some point in the log, so opening reads the
+    snapshot and just the log after that point.  The snapshot is written
+    to a temporary file and renamed over the old one, so a crash leaves
+    either the old or the new one.
+
+    In memory the top scores are a bounded heap, and the history is a
+    count of games per score and per day: how a score ranks and what
+    happened on a day are answered from those, never by reading the log.
+
+    Scores are added from one thread, and flush() and snapshot() may be
+    called from another.  Unless autoflush is turned off add() flushes
+    itself whenever a batch is due.'''
+
+    def __init__(self, directory, top=TOP, batch=SYNC_BATCH, interval=SYNC_INTERVAL):
+        self.directory = directory
+        self.size = top
+        self.batch = batch
+        self.interval = interval
+
+        self.heap = []
+        self.counts = {}
+        self.days = {}
+        self.games = 0
+
+        self.autoflush = True
+        self.lock = threading.RLock()
+        self.log = None
+        self.log_size = 0
+        self.pending = []
+        self.last_sync = time.time()
+        self.snapshot_size = 0
+
+        # caches of the sorted top scores and the cumulative counts
+        self._top = None
+        self._ranks = None
+
+        # the local day the last record fell on, as (start, end, ordinal)
+        self._day = (0, 0, 0)
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def open(self):
+        try: # create a directory
+            os.makedirs(self.directory)
+        except OSError:
+            pass
+
+        log_path = self._path(LOG)
+        have_log = os.path.exists(log_path)
+        if have_log:
+            self.log_size = os.path.getsize(log_path)
+
+        start = 0
+        if self._load_snapshot() and self.snapshot_size <= self.log_size:
+            start = self.snapshot_size
+        else:
+            self._clear()
+
+        if have_log:
+            end = self._read_log(log_path, start)
+            if end != self.log_size:
+                # a record cut short by a crash, drop it
+                f = open(log_path, 'r+b')
+                f.truncate(end)
+                f.close()
+                self.log_size = end
+
+        self.log = open(log_path, 'ab')
+        if not have_log:
+            self._import_old_table()
+
+    def _clear(self):
+        self.heap = []
+        self.counts = {}
+        self.days = {}
+        self.games = 0
+        self.snapshot_size = 0
+        self._top = None
+        self._ranks = None
+
+    def _load_snapshot(self):
+        try:
+            f = open(self._path(SNAPSHOT), 'r')
+            try:
+                data = json.load(f)
+            finally:
+                f.close()
+        except (IOError, ValueError):
+            return False
+        if data.get('version') != SNAPSHOT_VERSION:
+            return False
+
+        self.heap = list(data['top'])
+        heapq.heapify(self.heap)
+        self.counts = dict([(score, n) for score, n in data['counts']])
+        self.days = dict([(day, [games, best]) for day, games, best in data['days']])
+        self.games = data['games']
+        self.snapshot_size = data['log_size']
+        return True
+
+    def _read_log(self, path, start):
+        '''Index every whole record after start, returns where they end.'''
+        f = open(path, 'rb')
+        f.seek(start)
+        data = f.read()
+        f.close()
+
+        whole = len(data) - len(data) % RECORD.size
+        index = self._index
+        for when, score in RECORD.iter_unpack(data[:whole]):
+            index(when, score)
+        return start + whole
+
+    def _import_old_table(self):
+        path = self._path(OLD_TABLE)
+        try:
+            f = open(path, 'r')
+            scores = [int(x) for x in f.readlines() if x.strip()]
+            f.close()
+        except (IOError, ValueError):
+            return
+        when = int(os.path.getmtime(path))
+        for score in scores:
+            self.add(score, when)
+        self.flush()
+
+    def _day_of(self, when):
+        start, end, day = self._day
+        if not start <= when < end:
+            date = datetime.date.fromtimestamp(when)
+            day = date.toordinal()
+            start = int(time.mktime(date.timetuple()))
+            end = int(time.mktime((date + datetime.timedelta(1)).timetuple()))
+            self._day = (start, end, day)
+        return day
+
+    def _index(self, when, score):
+        heap = self.heap
+        if len(heap) < self.size:
+            heapq.heappush(heap, score)
+            self._top = None
+        elif score > heap[0]:
+            heapq.heapreplace(heap, score)
+            self._top = None
+
+        self.counts[score] = self.counts.get(score, 0) + 1
+        self._ranks = None
+
+        day = self._day_of(when)
+        stats = self.days.get(day)
+        if stats is None:
+            self.days[day] = [1, score]
+        else:
+            stats[0] += 1
+            if score > stats[1]:
+                stats[1] = score
+        self.games += 1
+
+    def add(self, score, when=None):
+        if when is None:
+            when = time.time()
+        when = int(when)
+        with self.lock:
+            self._index(when, score)
+            self.pending.append(RECORD.pack(when, score))
+        if self.autoflush and self.due():
+            self.flush()
+
+    def due(self):
+        '''Whether a batch of scores is waiting to be written.'''
+        return len(self.pending) >= self.batch or (self.pending and time.time() - self.last_sync >= self.interval)
+
+    def flush(self):
+        '''Get every score added so far onto the disk.'''
+        with self.lock:
+            self.last_sync = time.time()
+            if not self.pending or self.log is None:
+                return
+            data = b''.join(self.pending)
+            self.pending = []
+            self.log.write(data)
+            self.log.flush()
+            os.fsync(self.log.fileno())
+            self.log_size += len(data)
+            snapshot = self.log_size - self.snapshot_size >= SNAPSHOT_EVERY * RECORD.size
+
+        if snapshot:
+            self.snapshot()
+
+    def snapshot(self):
+        '''Write the index as of the end of the log.'''
+        with self.lock:
+            data = {'version': SNAPSHOT_VERSION,
+                    'log_size': self.log_size,
+                    'games': self.games,
+                    'top': sorted(self.heap, reverse=True),
+                    'counts': sorted(self.counts.items()),
+                    'days': sorted([(day, games, best) for day, (games, best) in self.days.items()]),}
+        path = self._path(SNAPSHOT)
+        temp = path + '.tmp'
+        f = open(temp, 'w')
+        json.dump(data, f, separators=(',', ':'))
+        f.flush()
+        os.fsync(f.fileno())
+        f.close()
+        os.replace(temp, path)
+        self.snapshot_size = data['log_size']
+
+    def close(self):
+        if self.log is None:
+            return
+        self.flush()
+        if self.snapshot_size != self.log_size:
+            self.snapshot()
+        self.log.close()
+        self.log = None
+
+    def __len__(self):
+        return self.games
+
+    def top(self):
+        '''The best scores, best first.'''
+        if self._top is None:
+            self._top = sorted(self.heap, reverse=True)
+        return self._top
+
+    def percentile(self, score):
+        '''The percentage of all games that scored score or less.'''
+        if self._ranks is None:
+            scores = sorted(self.counts)
+            cumulative = []
+            total = 0
+            for s in scores:
+                total += self.counts[s]
+                cumulative.append(total)
+            self._ranks = (scores, cumulative)
+        scores, cumulative = self._ranks
+        if not scores:
+            return 0.0
+        i = bisect.bisect_right(scores, score)
+        if i == 0:
+            return 0.0
+        return cumulative[i - 1] * 100.0 / self.games
+
+    def day(self, date):
+        '''(games, best score) played on date.'''
+        games, best = self.days.get(date.toordinal(), (0, None))
+        return games, best
+
+    def history(self):
+        '''(date, games, best score) of every day anything was played.'''
+        return [(datetime.date.fromordinal(day), games, best) for day, (games, best) in sorted(self.days.items())]
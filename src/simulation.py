@@ -0,0 +1,299 @@
+#
+# Copyright (C) 2008 - Mark Dillavou
+# Copyright (C) 2008 - UAB Game Developers Club (www.uab.edu/gamedev/)
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2, or (at your option)
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301  USA.
+
+import os
+import time
+import random
+
+import pygame
+
+from .floatipop import WIDTH, HEIGHT, Player, Cloud, Star, Whale, Balloon, add_random_objects, check_collision
+from .assets import Assets
+from .pool import Pool
+from .water import WaterStrip
+from .spatialhash import SpatialGroup
+from .entities import BALLOON, EntityStore, entity_images, add_random_entities
+
+# length of one simulation tick, in seconds
+TICK = 1.0 / 60.0
+# never try to catch up on more than this much real time in one go
+MAX_FRAME_TIME = .25
+
+def init_headless():
+    '''Set up just enough of pygame to load and convert images without a
+    window, so a Simulation can run on a machine with no display.'''
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    pygame.display.init()
+    if pygame.display.get_surface() is None:
+        pygame.display.set_mode((1, 1))
+        Assets().normalize()
+
+class KeyState(object):
+    '''Stand-in for pygame.key.get_pressed() when the input does not come
+    from a real keyboard.'''
+    def __init__(self, left=False, right=False, flap=False):
+        self.keys = set()
+        if left:
+            self.keys.add(pygame.K_LEFT)
+        if right:
+            self.keys.add(pygame.K_RIGHT)
+        if flap:
+            self.keys.add(pygame.K_SPACE)
+
+    def __getitem__(self, key):
+        return key in self.keys
+
+NO_KEYS = KeyState()
+
+class Simulation(object):
+    '''The game world, advanced by an explicit fixed tick.
+
+    Every tick reads the clock once: the tick length and the world time
+    (dt and now) are handed to every update, so everything in a tick sees
+    the same time and nothing waits on the real clock.  None of this
+    touches the display, which lets the world run as fast as the cpu
+    allows.  Collisions are swept over the whole tick, so a coarse tick
+    doesn't let anything pass through the player or the walls.  Set
+    scenery to also create the water and clouds, which only matter when
+    someone is looking.  Set entities to keep the stars, whales and
+    balloons in a numpy backed EntityStore instead of sprites.  Stress and
+    benchmark runs can pin the number of objects and make the player
+    immortal.'''
+
+    def __init__(self, seed=None, tick=TICK, scenery=False, entities=False, objects=None, immortal=False):
+        self.tick = tick
+        self.seed = seed
+        self.rng = random.Random(seed)
+        # water and clouds draw from their own stream, so a world with
+        # scenery plays out exactly like one without
+        self.scenery_rng = random.Random(self.rng.getrandbits(32))
+
+        # hold the world at exactly this many objects instead of letting
+        # the count grow with time
+        self.objects = objects
+        # put the player back instead of ending the game
+        self.immortal = immortal
+        # check what the player touches pixel by pixel, not just by
+        # (shrunken) boxes
+        self.precise_collisions = True
+
+        # anything with an add(phase, seconds) method gets the time spent
+        # in each phase of every tick
+        self.timer = None
+        self.phases = (('input', self._input),
+                       ('spawn', self._spawn),
+                       ('update', self._update),
+                       ('collision', self._collision),
+                       ('cleanup', self._cleanup),
+                       )
+        self.pressed_list = NO_KEYS
+        # top left of the objects near the player at the start of the tick
+        self.previous = {}
+        # gets every tick's input, see replay.Recorder
+        self.recorder = None
+
+        self.now = 0.0
+        self.accumulator = 0.0
+        self.ticks = 0
+        self.game_over = False
+
+        self.scroll_speed = 10.0
+
+        # the basic world
+        left_rect = pygame.Rect(-5, 0, 5, HEIGHT)
+        right_rect = pygame.Rect(WIDTH, 0, 5, HEIGHT)
+        ceiling_rect = pygame.Rect(0, -5, WIDTH, 5)
+        self.world_rects = [left_rect, right_rect, ceiling_rect]
+
+        # offscreen rect to delete old objects
+        self.delete_rect = pygame.Rect(1500, 0, 5, HEIGHT)
+
+        self.foreground_scrolling_sprites = pygame.sprite.Group()
+        self.water = None
+        self.background_scrolling_sprites = pygame.sprite.Group()
+        # objects the player can run into are kept in a grid
+        self.object_sprites = SpatialGroup()
+        self.movable_sprites = SpatialGroup()
+
+        # objects that scroll off or get picked up are reused
+        self.pools = {Star: Pool(Star),
+                      Whale: Pool(Whale),
+                      Balloon: Pool(Balloon),}
+
+        self.entities = None
+        if entities:
+            self.entities = EntityStore(entity_images())
+
+        if scenery:
+            self._make_scenery()
+        self.player = Player(self.scroll_speed)
+        self.player_sprites = pygame.sprite.RenderPlain((self.player))
+
+    def _make_scenery(self):
+        rng = self.scenery_rng
+        self.water = WaterStrip(self.scroll_speed, rng)
+        # clouds
+        for i in range(0, 7):
+            self.background_scrolling_sprites.add(Cloud(rng.randint(-WIDTH, WIDTH * 2), rng.randint(75, 350), self.scroll_speed, rng))
+
+    def set_scroll_speed(self, scroll_speed):
+        self.scroll_speed = scroll_speed
+        self.player.scroll_speed = scroll_speed
+        for object in self.foreground_scrolling_sprites:
+            object.scroll_speed = scroll_speed
+        if self.water is not None:
+            self.water.scroll_speed = scroll_speed
+        for object in self.background_scrolling_sprites:
+            object.scroll_speed = scroll_speed
+        for object in self.object_sprites:
+            object.scroll_speed = scroll_speed
+
+    def step(self, pressed_list=NO_KEYS):
+        '''Advance the world by exactly one tick.'''
+        if self.game_over:
+            return
+
+        if self.recorder is not None:
+            self.recorder.record(pressed_list)
+
+        self.now += self.tick
+        self.ticks += 1
+        self.pressed_list = pressed_list
+
+        # start increasing the scroll speed
+        if self.now > 25 and self.scroll_speed > 5: # 25 seconds
+            self.set_scroll_speed(self.scroll_speed - self.tick * .1)
+
+        timer = self.timer
+        for name, phase in self.phases:
+            if timer is None:
+                phase()
+            else:
+                start = time.perf_counter()
+                phase()
+                timer.add(name, time.perf_counter() - start)
+            if self.game_over:
+                break
+
+    def _input(self):
+        # handle input
+        self.player.handle_keys(self.pressed_list, self.now)
+
+    def _spawn(self):
+        # create new objects
+        if self.entities is not None:
+            add_random_entities(self.entities, self.now, self.scroll_speed, self.now, self.rng, self.objects)
+        else:
+            add_random_objects(self.object_sprites, self.now, self.scroll_speed, self.rng, self.pools, self.objects)
+
+    def _update(self):
+        # update everyone
+        dt = self.tick
+        now = self.now
+        self.player_sprites.update(dt, now)
+
+        # where the objects that can reach the player this tick were, for
+        # catching what passes through it between ticks
+        player = self.player
+        reach = self.reach()
+        area = player.rect.union(player.previous_rect).inflate(reach * 4, reach * 4)
+        self.previous = dict([(s, s.rect.topleft) for s in self.object_sprites.query(area)])
+
+        self.foreground_scrolling_sprites.update(dt, now)
+        if self.water is not None:
+            self.water.update(dt, now)
+        self.background_scrolling_sprites.update(dt, now)
+        self.object_sprites.update(dt, now)
+        self.movable_sprites.update(dt, now)
+        if self.entities is not None:
+            self.entities.update(dt, now, self.scroll_speed)
+
+    def _collision(self):
+        player = self.player
+
+        # check for collision
+        player.check_collision(self.world_rects, self.movable_sprites, self.object_sprites, self.now,
+                               self.precise_collisions, self.previous, self.reach())
+        if self.entities is not None:
+            self._collide_entities()
+        # game over?
+        if player.balloons <= 0:
+            if self.immortal:
+                player.reset(self.now)
+            else:
+                self.game_over = True
+
+    def _cleanup(self):
+        # check if scrolling sprites should be deleted
+        check_collision(self.delete_rect, self.object_sprites)
+        check_collision(self.delete_rect, self.movable_sprites)
+        if self.entities is not None:
+            self.entities.remove_beyond(self.delete_rect.left)
+
+    def _collide_entities(self):
+        # same rules as Star, Whale and Balloon.do_collision
+        store = self.entities
+        player = self.player
+        area = player.rect
+        if player.previous_rect is not None:
+            area = player.rect.union(player.previous_rect).inflate(self.reach() * 2, self.reach() * 2)
+        if player.balloons <= 0:
+            return
+        hits = []
+        for i in store.overlapping(area):
+            if player.hits(store.images[store.kind[i]], store.rect(i), store.previous_rect(i),
+                           self.precise_collisions):
+                hits.append(i)
+        for i in hits:
+            if store.kind[i] == BALLOON:
+                if player.do_add_balloon():
+                    store.remove([i])
+                    break
+            elif player.do_hit(store.view(i), self.now):
+                break
+
+    def reach(self):
+        '''The furthest anything can move in one tick, in pixels: whales
+        swim a bit faster than the scrolling, balloons rise.'''
+        return int(self.tick * max(WIDTH / self.scroll_speed * 1.2, 160)) + 1
+
+    def pool_stats(self):
+        stats = {}
+        for cls, pool in self.pools.items():
+            stats[cls.__name__] = pool.stats()
+        return stats
+
+    def advance(self, dt, pressed_list=NO_KEYS):
+        '''Feed dt seconds of time into the world, running as many whole
+        ticks as fit.  Left over time is carried to the next call.  Returns
+        the number of ticks run.'''
+        self.accumulator += min(dt, MAX_FRAME_TIME)
+        steps = 0
+        while self.accumulator >= self.tick and not self.game_over:
+            self.step(pressed_list)
+            self.accumulator -= self.tick
+            steps += 1
+        return steps
+
+    def run(self, ticks, pressed_list=NO_KEYS):
+        '''Run up to ticks ticks, stopping early on game over.'''
+        for i in range(ticks):
+            if self.game_over:
+                break
+            self.step(pressed_list)
+        return self.ticks
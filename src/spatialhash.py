@@ -0,0 +1,173 @@
+#
+# Copyright (C) 2008 - Mark Dillavou
+# Copyright (C) 2008 - UAB Game Developers Club (www.uab.edu/gamedev/)
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2, or (at your option)
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301  USA.
+
+import pygame
+
+CELL_SIZE = 128
+
+class SpatialHash(object):
+    '''A uniform grid of cell_size square cells, each holding the objects
+    whose rect touches it.
+
+    Objects are only re-filed when they move into a different set of cells,
+    so keeping the grid current is cheap.  query() hands back candidates in
+    the order they were inserted, which keeps collision handling
+    deterministic.'''
+
+    def __init__(self, cell_size=CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.ranges = {}
+        self.order = {}
+        self.counter = 0
+
+    def __len__(self):
+        return len(self.ranges)
+
+    def __contains__(self, obj):
+        return obj in self.ranges
+
+    def _range(self, rect):
+        s = self.cell_size
+        return (rect.left // s, rect.top // s, (rect.right - 1) // s, (rect.bottom - 1) // s)
+
+    def _add(self, obj, r):
+        cells = self.cells
+        for x in range(r[0], r[2] + 1):
+            for y in range(r[1], r[3] + 1):
+                cell = cells.get((x, y))
+                if cell is None:
+                    cell = cells[(x, y)] = set()
+                cell.add(obj)
+
+    def _discard(self, obj, r):
+        cells = self.cells
+        for x in range(r[0], r[2] + 1):
+            for y in range(r[1], r[3] + 1):
+                cell = cells[(x, y)]
+                cell.discard(obj)
+                if not cell:
+                    del cells[(x, y)]
+
+    def insert(self, obj, rect):
+        if obj in self.ranges:
+            self.move(obj, rect)
+            return
+
+        r = self._range(rect)
+        self.ranges[obj] = r
+        self.order[obj] = self.counter
+        self.counter += 1
+        self._add(obj, r)
+
+    def move(self, obj, rect):
+        r = self._range(rect)
+        old = self.ranges[obj]
+        if r != old:
+            self._discard(obj, old)
+            self._add(obj, r)
+            self.ranges[obj] = r
+
+    def remove(self, obj):
+        r = self.ranges.pop(obj, None)
+        if r is not None:
+            self._discard(obj, r)
+            del self.order[obj]
+
+    def query(self, rect):
+        '''Objects filed in any cell rect touches.  These are only
+        candidates, they still need a real overlap test.'''
+        x0, y0, x1, y1 = self._range(rect)
+        cells = self.cells
+        found = set()
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                cell = cells.get((x, y))
+                if cell:
+                    found.update(cell)
+        return sorted(found, key=self.order.__getitem__)
+
+    def rings(self, x, y):
+        '''Yields (reach, objects) for ring after ring of cells around the
+        point (x, y), its own cell first.  Once reach is yielded every
+        object touching a point within reach of (x, y) has been handed
+        out, some of them more than once.  Never ends, stop when there is
+        enough.'''
+        s = self.cell_size
+        cx = int(x // s)
+        cy = int(y // s)
+        # how far the point is from leaving its own cell
+        inner = min(x - cx * s, y - cy * s, (cx + 1) * s - x, (cy + 1) * s - y)
+        cells = self.cells
+        r = 0
+        while 1:
+            if r == 0:
+                keys = [(cx, cy)]
+            else:
+                keys = ([(cx + i, cy - r) for i in range(-r, r + 1)] +
+                        [(cx + i, cy + r) for i in range(-r, r + 1)] +
+                        [(cx - r, cy + j) for j in range(1 - r, r)] +
+                        [(cx + r, cy + j) for j in range(1 - r, r)])
+            found = []
+            for key in keys:
+                cell = cells.get(key)
+                if cell:
+                    found.extend(cell)
+            yield inner + r * s, found
+            r += 1
+
+class SpatialGroup(pygame.sprite.Group):
+    '''A sprite group that files its sprites in a SpatialHash.
+
+    Sprites are added to the grid when they join the group, dropped when
+    they leave, and re-filed after every update().  Code that moves a
+    sprite any other way should call refresh().'''
+
+    def __init__(self, *sprites, **kwds):
+        self.grid = SpatialHash(kwds.get('cell_size', CELL_SIZE))
+        pygame.sprite.Group.__init__(self, *sprites)
+
+    def add_internal(self, sprite, *args):
+        pygame.sprite.Group.add_internal(self, sprite, *args)
+        self.grid.insert(sprite, sprite.rect)
+
+    def remove_internal(self, sprite):
+        pygame.sprite.Group.remove_internal(self, sprite)
+        self.grid.remove(sprite)
+
+    def update(self, *args, **kwds):
+        pygame.sprite.Group.update(self, *args, **kwds)
+        self.refresh()
+
+    def refresh(self):
+        move = self.grid.move
+        for sprite in self.sprites():
+            move(sprite, sprite.rect)
+
+    def query(self, rect):
+        return self.grid.query(rect)
+
+    def rings(self, x, y):
+        return self.grid.rings(x, y)
+
+def nearby(group, rect):
+    '''The sprites in group that could touch rect.  Plain groups and lists
+    have no grid, so everything in them is a candidate.'''
+    if isinstance(group, SpatialGroup):
+        return group.query(rect)
+    return group
@@ -0,0 +1,103 @@
+#
+# Copyright (C) 2008 - Mark Dillavou
+# Copyright (C) 2008 - UAB Game Developers Club (www.uab.edu/gamedev/)
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2, or (at your option)
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301  USA.
+
+import pygame
+from pygame.locals import *
+
+class NumberText(object):
+    '''A label followed by a number, composed from pre-rendered glyphs.
+
+    The ten digits are rendered once and every digit gets a cell as wide
+    as the widest one, so when the number changes only the digits that
+    differ are copied into the cached surface.  The font is only used
+    again when the number gains a digit.'''
+
+    def __init__(self, font, label, color):
+        self.label = font.render(label, 1, color)
+        self.digits = [font.render(str(i), 1, color) for i in range(10)]
+        self.cell = max([d.get_width() for d in self.digits])
+        self.height = max([self.label.get_height()] + [d.get_height() for d in self.digits])
+
+        self.text = None
+        self.surface = None
+        # glyph blits done, for keeping an eye on the cache
+        self.glyphs_drawn = 0
+
+    def _build(self, text):
+        width = self.label.get_width() + self.cell * len(text)
+        self.surface = pygame.Surface((width, self.height), SRCALPHA, 32)
+        self.surface.blit(self.label, (0, 0))
+        self.text = ' ' * len(text)
+
+    def render(self, value):
+        text = '%d' % value
+        if text == self.text:
+            return self.surface
+
+        if self.text is None or len(text) != len(self.text):
+            self._build(text)
+
+        x = self.label.get_width()
+        for i, c in enumerate(text):
+            if c != self.text[i]:
+                cell = pygame.Rect(x + i * self.cell, 0, self.cell, self.height)
+                self.surface.fill((0, 0, 0, 0), cell)
+                # the cell is clear, so taking the max copies the glyph
+                # over exactly, alpha included
+                self.surface.blit(self.digits[int(c)], cell, special_flags=BLEND_RGBA_MAX)
+                self.glyphs_drawn += 1
+        self.text = text
+        return self.surface
+
+class ScoreTable(object):
+    '''Rendered rows of the high score table, rebuilt only when the scores
+    or the highlighted score change.'''
+
+    def __init__(self, font, start_pos=(130, 210), skip_space=(400, 45)):
+        self.font = font
+        self.start_pos = start_pos
+        self.skip_space = skip_space
+        self.key = None
+        self.rows = []
+        self.builds = 0
+
+    def render(self, scores, current_score):
+        key = (tuple(scores), current_score)
+        if key == self.key:
+            return self.rows
+
+        rows = []
+        found_current = False
+        for i, score in enumerate(scores):
+            col = i // 10
+            row = i % 10
+
+            color = (255, 255, 255)
+            if score == current_score and not found_current:
+                found_current = True
+                color = (150, 150, 150)
+
+            text = self.font.render("%d) %d" % (i + 1, score), 1, color)
+            textpos = text.get_rect()
+            textpos.topleft = (self.start_pos[0] + col * self.skip_space[0], self.start_pos[1] + row * self.skip_space[1])
+            rows.append((text, textpos))
+
+        self.key = key
+        self.rows = rows
+        self.builds += 1
+        return rows
@@ -0,0 +1,94 @@
+#
+# Copyright (C) 2008 - Mark Dillavou
+# Copyright (C) 2008 - UAB Game Developers Club (www.uab.edu/gamedev/)
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2, or (at your option)
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301  USA.
+
+import math
+import random
+
+import pygame
+from pygame.locals import *
+
+from .floatipop import WIDTH, HEIGHT, load_image
+
+TILE_WIDTH = 88
+# tiles across one strip, enough to cover the screen with one tile to spare
+TILES = (WIDTH + TILE_WIDTH) // TILE_WIDTH + 1
+STRIP_WIDTH = TILES * TILE_WIDTH
+
+# how far the waves bob up and down, and how fast (radians per second)
+AMPLITUDE = 5
+WAVE_SPEED = 5.0
+# frames baked for one wave cycle
+FRAMES = 32
+
+class WaterStrip(object):
+    '''The water along the bottom of the screen.
+
+    Two rows of bobbing water tiles, every tile with its own phase.  The
+    whole wave cycle is baked into FRAMES strip images up front, so a frame
+    is picking the image for the time and drawing it twice, side by side,
+    at the scroll offset.'''
+
+    def __init__(self, scroll_speed, rng=random, frames=FRAMES):
+        self.scroll_speed = scroll_speed
+        self.x = 0.0
+        self.frame = 0
+
+        image, r = load_image('water.png', -1)
+        height = image.get_height()
+
+        # (left, centre y, phase) of every tile, back row first
+        tiles = []
+        for i in range(TILES):
+            tiles.append((i * TILE_WIDTH, HEIGHT - height / 2 + 10, rng.uniform(0, 2 * math.pi)))
+        for i in range(TILES):
+            tiles.append((i * TILE_WIDTH - TILE_WIDTH // 2, HEIGHT - height / 2 + 5, rng.uniform(0, 2 * math.pi)))
+
+        self.top = int(min([y for x, y, p in tiles]) - height / 2 - AMPLITUDE)
+        bottom = int(max([y for x, y, p in tiles]) + height / 2 + AMPLITUDE) + 1
+
+        colorkey = image.get_colorkey()
+        self.frames = []
+        for k in range(frames):
+            t = 2 * math.pi * k / frames
+            strip = pygame.Surface((STRIP_WIDTH, bottom - self.top)).convert()
+            strip.fill(colorkey)
+            for left, y, phase in tiles:
+                top = int(y + math.sin(t + phase) * AMPLITUDE - height / 2) - self.top
+                strip.blit(image, (left, top))
+                # tiles hanging off one end come in at the other
+                if left < 0:
+                    strip.blit(image, (left + STRIP_WIDTH, top))
+            strip.set_colorkey(colorkey, RLEACCEL)
+            self.frames.append(strip)
+
+    def update(self, dt, now):
+        self.x = (self.x + WIDTH / self.scroll_speed * dt) % STRIP_WIDTH
+        cycle = now * WAVE_SPEED / (2 * math.pi)
+        self.frame = int(cycle * len(self.frames)) % len(self.frames)
+
+    def blit_list(self, bounds):
+        image = self.frames[self.frame]
+        x = int(self.x)
+        blits = []
+        for left in (x - STRIP_WIDTH, x):
+            if left < bounds.right and left + STRIP_WIDTH > bounds.left:
+                blits.append((image, (left, self.top)))
+        return blits
+
+    def draw(self, surface):
+        return surface.blits(self.blit_list(surface.get_rect()))
@@ -0,0 +1,71 @@
+#
+# Copyright (C) 2008 - Mark Dillavou
+# Copyright (C) 2008 - UAB Game Developers Club (www.uab.edu/gamedev/)
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2, or (at your option)
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301  USA.
+
+import os
+import sys
+import unittest
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src import floatipop
+from src.simulation import Simulation, init_headless
+
+floatipop.DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+init_headless()
+
+class WallTest(unittest.TestCase):
+
+    def bounces(self, tick, x, force_x, ticks=40):
+        '''Throw the shrimp at a wall, returns how often it turned round
+        and where it ended up.'''
+        sim = Simulation(seed=1, tick=tick, objects=0)
+        p = sim.player
+        sim.step()
+        p.current_pos_x = p.start_pos_x = x
+        p.force_x = force_x
+        p.force_y = 0
+        p.on_ground = False
+        turns = 0
+        for i in range(ticks):
+            before = p.force_x
+            sim.step()
+            if (before < 0) != (p.force_x < 0):
+                turns += 1
+        return turns, p
+
+    def test_left_wall_once(self):
+        turns, p = self.bounces(.02, 60, -150)
+        self.assertEqual(turns, 1)
+        self.assertTrue(p.force_x > 0)
+        self.assertTrue(p.collision_rect.left >= 0)
+
+    def test_right_wall_once(self):
+        turns, p = self.bounces(.02, floatipop.WIDTH - 60, 150)
+        self.assertEqual(turns, 1)
+        self.assertTrue(p.force_x < 0)
+        self.assertTrue(p.collision_rect.right <= floatipop.WIDTH)
+
+    def test_coarse_tick_once(self):
+        # fast enough to go through the wall in a single tick
+        turns, p = self.bounces(.5, 20, -150, ticks=6)
+        self.assertEqual(turns, 1)
+        self.assertTrue(p.collision_rect.left >= 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+#
+# Copyright (C) 2008 - Mark Dillavou
+# Copyright (C) 2008 - UAB Game Developers Club (www.uab.edu/gamedev/)
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2, or (at your option)
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301  USA.
+
+import os
+import sys
+import unittest
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src import floatipop
+from src.floatipop import Whale
+from src.simulation import TICK, init_headless
+from src.entities import EntityStore, WHALE, entity_images, numpy
+
+floatipop.DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+init_headless()
+
+@unittest.skipIf(numpy is None, 'needs numpy')
+class WhaleTest(unittest.TestCase):
+
+    def test_same_path_as_the_sprite(self):
+        scroll_speed = 10.0
+        now = 3.0
+        whale = Whale(-170, 300, scroll_speed)
+        store = EntityStore(entity_images())
+        i = store.spawn(WHALE, -170, 300, now)
+
+        for tick in range(600):
+            # the scrolling speeds up as the game goes on
+            if tick == 300:
+                scroll_speed = 7.5
+                whale.scroll_speed = scroll_speed
+            whale.update(TICK, now)
+            store.update(TICK, now, scroll_speed)
+            x, y = store.rect(i).center
+            self.assertTrue(abs(x - whale.rect.centerx) <= 1, (tick, x, whale.rect.centerx))
+            self.assertTrue(abs(y - whale.rect.centery) <= 1, (tick, y, whale.rect.centery))
+            now += TICK
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+#
+# Copyright (C) 2008 - Mark Dillavou
+# Copyright (C) 2008 - UAB Game Developers Club (www.uab.edu/gamedev/)
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2, or (at your option)
+# any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301  USA.
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.leaderboard import ConnectionPool
+from src.leaderboard_server import serve
+
+class RestartTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='leaderboard-test-')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def send(self, scores):
+        server = serve(0, self.directory)
+        pool = ConnectionPool(server.url())
+        try:
+            status, response, result = pool.request('POST', '/scores', {'cabinet': 'test', 'scores': scores})
+        finally:
+            pool.close()
+            server.close()
+        self.assertEqual(status, 200)
+        return result
+
+    def test_sent_again_after_a_restart(self):
+        scores = [['a', 100, 1000], ['b', 200, 1001]]
+        self.assertEqual(self.send(scores)['games'], 2)
+        # the answer got lost, the cabinet tries again with a new score too
+        result = self.send(scores + [['c', 300, 1002]])
+        self.assertEqual(result['games'], 3)
+        self.assertEqual(result['top'], [300, 200, 100])
+
+if __name__ == '__main__':
+    unittest.main()